@@ -0,0 +1,281 @@
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import argparse
+import threading
+
+import numpy as np
+import pygame
+
+from preload import LoadRecord
+
+
+MAGIC = b"AMDPAK01"
+HEADER = struct.Struct("<8sQQ")
+ALIGN = 64
+
+
+class AssetArchive(object):
+    """ Read side of a baked asset archive: one file holding every image,
+    already in the display's 32-bit pixel format with colorkeys turned into
+    alpha, and every sound as raw PCM in the mixer's format. The file is
+    memory-mapped and surfaces and sounds are built straight from slices of
+    the mapping, so opening it reads nothing but the index.
+
+    Images are looked up by the same (path, convert, colorkey, alpha) keys as
+    the image cache, plus a flip for pre-mirrored sprite sheets. Surfaces the
+    image cache made with derived() are stored under their names.
+
+    Every surface or sound served is timed into loads, as LoadRecords, for
+    the preloader's load report. """
+
+    def __init__(self, path):
+        start = time.perf_counter()
+        self.path = path
+        self.file = open(path, "rb")
+
+        #   Copy-on-write, so a surface drawn on by mistake can't reach the file
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_COPY)
+        self.view = memoryview(self.map)
+        magic, index_offset, index_length = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not an asset archive" % path)
+        index = json.loads(bytes(self.view[index_offset:index_offset + index_length]))
+
+        self.sources = index["sources"]
+        self.sound_format = tuple(index["sound_format"]) if index["sound_format"] else None
+        self.images = {}
+        for entry in index["images"]:
+            self.images[image_key(*entry["key"])] = entry
+        self.sounds = {entry["path"]: entry for entry in index["sounds"]}
+
+        self.loads = []
+        self.open_seconds = time.perf_counter() - start
+
+    def __contains__(self, path):
+        return path in self.sources
+
+    def stale(self):
+        """ Source files that changed since the archive was baked. """
+
+        changed = []
+        for path, (size, mtime) in self.sources.items():
+            if not os.path.exists(path):
+                continue
+            stat = os.stat(path)
+            if stat.st_size != size or int(stat.st_mtime) != mtime:
+                changed.append(path)
+        return changed
+
+    def image(self, path, convert=False, colorkey=None, alpha=None, flip=None):
+        """ Returns a surface backed by the archive for that variant of path,
+        or None if it wasn't baked. """
+
+        entry = self.images.get(image_key(path, convert, colorkey, alpha, flip))
+        if entry is None:
+            return None
+        start = time.perf_counter()
+        offset = entry["offset"]
+        surf = pygame.image.frombuffer(self.view[offset:offset + entry["length"]], tuple(entry["size"]), "BGRA")
+        if entry["opaque"]:
+            surf.set_alpha(None)
+        if alpha is not None:
+            surf.set_alpha(alpha)
+        variant = [name for name, used in (("convert", convert), ("key", colorkey is not None),
+                                           ("alpha", alpha is not None), ("flip", flip and any(flip))) if used]
+        self.record(" ".join([path] + variant), "image", start, entry["length"])
+        return surf
+
+    def sound(self, path):
+        """ Returns a Sound built from the archived PCM for path, or None if it
+        wasn't baked or the mixer runs in a different format. """
+
+        entry = self.sounds.get(path)
+        if entry is None or pygame.mixer.get_init() != self.sound_format:
+            return None
+        start = time.perf_counter()
+        offset = entry["offset"]
+        sound = pygame.mixer.Sound(buffer=self.view[offset:offset + entry["length"]])
+        self.record(path, "sound", start, entry["length"])
+        return sound
+
+    def record(self, path, kind, start, size):
+        self.loads.append(LoadRecord(path, kind, start, time.perf_counter() - start, size,
+                                     threading.current_thread().name))
+
+    def entries(self):
+        return len(self.images) + len(self.sounds)
+
+
+def image_key(path, convert=False, colorkey=None, alpha=None, flip=None):
+    return (path, bool(convert), tuple(colorkey) if colorkey is not None else None, alpha,
+            tuple(flip) if flip else None)
+
+
+def flatten(surf):
+    """ Returns the pixels of surf as BGRA bytes that blit the same way it
+    does, with its colorkey folded into the alpha channel, and whether every
+    pixel came out opaque. """
+
+    rgb = pygame.surfarray.array3d(surf)
+    if surf.get_masks()[3]:
+        alpha = pygame.surfarray.array_alpha(surf)
+    else:
+        alpha = np.full(rgb.shape[:2], 255, dtype=np.uint8)
+    if surf.get_colorkey() is not None:
+        #   Find the keyed pixels by drawing, since in a palette image other
+        #   entries can share the key's colour
+        keyed = np.ones(rgb.shape[:2], dtype=bool)
+        for background in ((255, 0, 255), (0, 255, 0)):
+            test = pygame.Surface(surf.get_size())
+            test.fill(background)
+            test.blit(surf, (0, 0))
+            keyed &= (pygame.surfarray.array3d(test) == background).all(axis=2)
+        alpha[keyed] = 0
+
+    flat = pygame.Surface(surf.get_size(), pygame.SRCALPHA, 32)
+    pygame.surfarray.pixels3d(flat)[:] = rgb
+    pygame.surfarray.pixels_alpha(flat)[:] = alpha
+    return pygame.image.tobytes(flat, "BGRA"), bool((alpha == 255).all())
+
+
+class ArchiveWriter(object):
+    """ Write side: collects blobs and writes them, 64-byte aligned, followed
+    by a JSON index. """
+
+    def __init__(self):
+        self.blobs = []
+        self.offset = HEADER.size
+        self.images = []
+        self.sounds = []
+        self.sources = {}
+
+    def add_blob(self, data):
+        self.offset += -self.offset % ALIGN
+        offset = self.offset
+        self.blobs.append((offset, data))
+        self.offset += len(data)
+        return offset
+
+    def add_source(self, path):
+        stat = os.stat(path)
+        self.sources[path] = (stat.st_size, int(stat.st_mtime))
+
+    def add_image(self, surf, path, convert=False, colorkey=None, alpha=None, flip=None):
+        """ Bakes surf as the given variant of path. """
+
+        data, opaque = flatten(surf)
+        self.images.append({"key": list(image_key(path, convert, colorkey, alpha, flip)),
+                            "offset": self.add_blob(data),
+                            "length": len(data),
+                            "size": surf.get_size(),
+                            "opaque": opaque})
+        if os.path.exists(path):
+            self.add_source(path)
+
+    def add_sound(self, sound, path):
+        data = sound.get_raw()
+        self.sounds.append({"path": path, "offset": self.add_blob(data), "length": len(data)})
+        self.add_source(path)
+
+    def write(self, path):
+        index = json.dumps({"sources": self.sources,
+                            "sound_format": pygame.mixer.get_init(),
+                            "images": self.images,
+                            "sounds": self.sounds}).encode()
+        with open(path, "wb") as out:
+            out.write(HEADER.pack(MAGIC, self.offset, len(index)))
+            for offset, data in self.blobs:
+                out.seek(offset)
+                out.write(data)
+            out.seek(self.offset)
+            out.write(index)
+
+
+def exercise(game, frames):
+    """ Plays the title screen and some of the fight so that every image
+    variant the game asks for ends up in the caches. """
+
+    game.start()
+    for i in range(frames):
+        game.frame()
+    game.start_title()
+    for i in range(10):
+        game.title_frame(1/60.0, i/60.0)
+
+
+def mismatches(archive, writer):
+    """ Counts baked images that don't blit exactly like the surface they
+    were baked from, over two different backgrounds. """
+
+    from assets import images
+    bad = []
+    for entry in writer.images:
+        key = image_key(*entry["key"])
+        path, convert, colorkey, alpha, flip = key
+        if flip:
+            original = images.flipped(path, *flip)
+        elif (path, convert, colorkey, alpha) in images.surfaces:
+            original = images.surfaces[(path, convert, colorkey, alpha)]
+        elif path in images.made:
+            original = images.made[path]
+        else:
+            original = images.raw[path]
+        baked = archive.image(*key)
+        for background in ((128, 128, 128), (255, 0, 255)):
+            a = pygame.Surface(original.get_size())
+            b = pygame.Surface(original.get_size())
+            a.fill(background)
+            b.fill(background)
+            a.blit(original, (0, 0))
+            b.blit(baked, (0, 0))
+            if pygame.image.tobytes(a, "RGB") != pygame.image.tobytes(b, "RGB"):
+                bad.append(key)
+                break
+    return bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack every image and sound into one memory-mapped archive.")
+    parser.add_argument("--out", default="assets.pak")
+    parser.add_argument("--frames", type=int, default=600, help="fight frames to play while collecting variants")
+    args = parser.parse_args()
+
+    from headless import HeadlessGame
+    from assets import images, sounds
+
+    class BakeGame(HeadlessGame):
+        archive_path = None
+
+    game = BakeGame(render=True)
+    exercise(game, args.frames)
+
+    writer = ArchiveWriter()
+    for path in game.preloader.manifest():
+        if path.endswith(".wav"):
+            writer.add_sound(sounds.decode(path), path)
+        else:
+            writer.add_image(images.decode(path), path)
+    for (path, convert, colorkey, alpha), surf in images.surfaces.items():
+        if convert or colorkey is not None or alpha is not None:
+            writer.add_image(surf, path, convert, colorkey, alpha)
+    for (path, flip_x, flip_y), surf in images.flips.items():
+        writer.add_image(surf, path, flip=(flip_x, flip_y))
+    for name, surf in images.made.items():
+        writer.add_image(surf, name)
+    writer.write(args.out)
+
+    archive = AssetArchive(args.out)
+    bad = mismatches(archive, writer)
+    print("%s images and %s sounds, %.1f MB, written to %s" %
+          (len(writer.images), len(writer.sounds), os.path.getsize(args.out) / 1e6, args.out))
+    for key in bad:
+        print("  differs from source: %s" % (key,))
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
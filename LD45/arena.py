@@ -0,0 +1,92 @@
+import numpy as np
+
+
+class EllipseArena(object):
+    """ The arena floor: an ellipse shrunk by margin, plus round openings
+    (centre, radius) where the floor runs out under an arch. Things outside
+    are pushed straight back toward the middle. """
+
+    def __init__(self, major, minor, margin=0.5, openings=()):
+        self.major = major - margin
+        self.minor = minor - margin
+        self.openings = list(openings)
+
+    def inside(self, xs, ys):
+        result = xs**2/self.major**2 + ys**2/self.minor**2 <= 1
+        for (cx, cy), radius in self.openings:
+            result |= (xs - cx)**2 + (ys - cy)**2 < radius**2
+        return result
+
+    def push(self, xs, ys):
+        """ Unit vectors pointing back into the arena. """
+        d = np.hypot(xs, ys)
+        d[d == 0] = 1
+        return -xs / d, -ys / d
+
+
+class ArenaField(object):
+    """ An arena shape sampled once onto a grid of cells_per_tile cells per
+    tile over bounds (left, top, right, bottom), storing whether each cell is
+    inside and which way to push things that are not. Lookups are an index
+    into the grid, with a scalar form for single entities and an array form
+    for the bullet and particle pools. Anything off the grid is outside.
+
+    Any object with array inside(xs, ys) and push(xs, ys) methods can be used
+    as the shape. """
+
+    def __init__(self, shape, bounds, cells_per_tile=16):
+        self.shape = shape
+        self.left, self.top, right, bottom = bounds
+        self.cells_per_tile = cells_per_tile
+        self.width = int(np.ceil((right - self.left) * cells_per_tile))
+        self.height = int(np.ceil((bottom - self.top) * cells_per_tile))
+
+        #   Sample at the centre of each cell
+        xs = self.left + (np.arange(self.width) + 0.5) / cells_per_tile
+        ys = self.top + (np.arange(self.height) + 0.5) / cells_per_tile
+        grid_x, grid_y = np.meshgrid(xs, ys)
+        self.mask = shape.inside(grid_x, grid_y)
+        push_x, push_y = shape.push(grid_x, grid_y)
+        self.push_x = push_x.astype(np.float32)
+        self.push_y = push_y.astype(np.float32)
+
+        #   Nested lists index faster than numpy for one point at a time. Only
+        #   things outside ask for a push, so that stays in numpy
+        self.rows = self.mask.tolist()
+        self.fallback = shape.push
+
+    def inside(self, x, y):
+        i = (x - self.left) * self.cells_per_tile
+        j = (y - self.top) * self.cells_per_tile
+        if 0 <= i < self.width and 0 <= j < self.height:
+            return self.rows[int(j)][int(i)]
+        return False
+
+    def push(self, x, y):
+        """ Unit vector (x, y) pointing back into the arena from (x, y). """
+
+        i = (x - self.left) * self.cells_per_tile
+        j = (y - self.top) * self.cells_per_tile
+        if 0 <= i < self.width and 0 <= j < self.height:
+            return self.push_x.item(int(j), int(i)), self.push_y.item(int(j), int(i))
+        push_x, push_y = self.fallback(np.array([x], dtype=float), np.array([y], dtype=float))
+        return push_x[0], push_y[0]
+
+    def cells_batch(self, xs, ys):
+        i = np.floor((xs - self.left) * self.cells_per_tile).astype(np.int64)
+        j = np.floor((ys - self.top) * self.cells_per_tile).astype(np.int64)
+        on_grid = (i >= 0) & (i < self.width) & (j >= 0) & (j < self.height)
+        return np.where(on_grid, i, 0), np.where(on_grid, j, 0), on_grid
+
+    def inside_batch(self, xs, ys):
+        i, j, on_grid = self.cells_batch(xs, ys)
+        return self.mask[j, i] & on_grid
+
+    def push_batch(self, xs, ys):
+        i, j, on_grid = self.cells_batch(xs, ys)
+        push_x = self.push_x[j, i].astype(np.float64)
+        push_y = self.push_y[j, i].astype(np.float64)
+        if not on_grid.all():
+            off = ~on_grid
+            push_x[off], push_y[off] = self.fallback(xs[off], ys[off])
+        return push_x, push_y
@@ -0,0 +1,352 @@
+from collections import OrderedDict
+
+import pygame
+
+
+class ImageCache(object):
+    """ Process-wide image registry. Each file is decoded from disk once, and
+    each combination of conversion flags is prepared once on top of that. """
+
+    def __init__(self):
+
+        #   path -> surface exactly as decoded from disk
+        self.raw = {}
+
+        #   path -> future of a decode running in the background
+        self.pending = {}
+
+        #   (path, convert, colorkey, alpha) -> prepared, shared surface
+        self.surfaces = {}
+
+        #   (path, flip_x, flip_y) -> mirrored copy of the decoded surface
+        self.flips = {}
+
+        #   name -> surface made from other images, like a scaled mip level
+        self.made = {}
+
+        #   Baked AssetArchive to take surfaces from before touching the disk
+        self.archive = None
+
+        #   TextureAtlas that small prepared surfaces are packed into
+        self.atlas = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def decode(self, path):
+        """ Returns the decoded surface for path, reading the file only the
+        first time it is asked for. """
+
+        surf = self.raw.get(path)
+        if surf is None:
+            future = self.pending.pop(path, None)
+            if future:
+                surf = future.result()
+            elif self.archive and path in self.archive:
+                surf = self.archive.image(path)
+            if surf is None:
+                surf = pygame.image.load(path)
+            self.raw[path] = surf
+        return surf
+
+    def load(self, path, convert=False, colorkey=None, alpha=None):
+        """ Returns a shared surface for path with the given conversion flags
+        applied. Callers must not modify the returned surface in place. """
+
+        key = (path, convert, colorkey, alpha)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.hits += 1
+            return surf
+
+        self.misses += 1
+        if self.archive and (convert or colorkey is not None or alpha is not None):
+            surf = self.archive.image(path, convert, colorkey, alpha)
+            if surf is not None:
+                surf = self.pack(surf)
+                self.surfaces[key] = surf
+                return surf
+
+        surf = self.decode(path)
+        if convert:
+            surf = surf.convert()
+        elif colorkey is not None or alpha is not None:
+            surf = surf.copy()
+        if colorkey is not None:
+            surf.set_colorkey(colorkey)
+        if alpha is not None:
+            surf.set_alpha(alpha)
+
+        surf = self.pack(surf)
+        self.surfaces[key] = surf
+        return surf
+
+    def pack(self, surf):
+        """ Returns surf copied into the atlas, if there is one and surf is
+        small enough to go in it. """
+
+        if self.atlas is None:
+            return surf
+        return self.atlas.add(surf)
+
+    def flipped(self, path, flip_x, flip_y):
+        """ Returns a shared, mirrored copy of the decoded surface for path. """
+
+        key = (path, bool(flip_x), bool(flip_y))
+        surf = self.flips.get(key)
+        if surf is None:
+            if self.archive and path in self.archive:
+                surf = self.archive.image(path, flip=key[1:])
+            if surf is None:
+                surf = pygame.transform.flip(self.decode(path), flip_x, flip_y)
+            self.flips[key] = surf
+        return surf
+
+    def derived(self, name, build):
+        """ Returns the surface build() makes, shared under name. Surfaces
+        made this way are baked into asset archives as well, so ones that are
+        slow to make can be read straight from the archive instead. """
+
+        surf = self.made.get(name)
+        if surf is None:
+            if self.archive:
+                surf = self.archive.image(name)
+            if surf is None:
+                surf = build()
+            self.made[name] = surf
+        return surf
+
+    def memory(self):
+        """ Approximate number of bytes of pixel data held by the cache. """
+
+        unique = {id(surf): surf for surf in self.raw.values()}
+        unique.update({id(surf): surf for surf in self.surfaces.values()})
+        unique.update({id(surf): surf for surf in self.flips.values()})
+        unique.update({id(surf): surf for surf in self.made.values()})
+        return sum(surf.get_pitch() * surf.get_height() for surf in unique.values())
+
+    def stats(self):
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "files": len(self.raw),
+                "surfaces": len(self.surfaces),
+                "bytes": self.memory()}
+
+    def clear(self):
+        self.raw = {}
+        self.pending = {}
+        self.surfaces = {}
+        self.flips = {}
+        self.made = {}
+        self.hits = 0
+        self.misses = 0
+
+
+images = ImageCache()
+
+
+class BankSound(object):
+    """ Handle to a shared, decoded sound. Playing it goes through the bank's
+    channel pool instead of letting pygame pick a channel. """
+
+    def __init__(self, bank, path, volume, max_voices):
+        self.bank = bank
+        self.path = path
+        self.sound = bank.decode(path)
+        self.volume = volume
+        self.max_voices = max_voices
+
+        #   Channels this sound was last started on, oldest first
+        self.voices = []
+
+    def play(self):
+        return self.bank.play(self)
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+    def get_volume(self):
+        return self.volume
+
+
+class SoundBank(object):
+    """ Decodes each sound file once and plays effects through a fixed pool of
+    mixer channels, with a cap on how many voices one sound may hold. When a
+    sound is at its cap, or the pool is full, the oldest voice is stolen. """
+
+    def __init__(self, channels=16, default_voices=4, extra_channels=4):
+        self.channel_count = channels
+        self.default_voices = default_voices
+        self.extra_channels = extra_channels
+
+        self.raw = {}
+        self.pending = {}
+        self.handles = {}
+        self.channels = []
+        self.archive = None
+
+        #   Play counter value when each pool channel was last started
+        self.started = []
+
+        self.hits = 0
+        self.misses = 0
+        self.plays = 0
+        self.steals = 0
+
+        #   Called with the file path of every effect played
+        self.listener = None
+
+    def decode(self, path):
+        """ Returns the shared pygame Sound for path, decoding it once. """
+
+        sound = self.raw.get(path)
+        if sound is None:
+            future = self.pending.pop(path, None)
+            if future:
+                sound = future.result()
+            elif self.archive and path in self.archive:
+                sound = self.archive.sound(path)
+            if sound is None:
+                sound = pygame.mixer.Sound(path)
+            self.raw[path] = sound
+        return sound
+
+    def sound(self, path, volume=1.0, max_voices=None):
+        """ Returns a shared handle for path played at volume. """
+
+        if max_voices is None:
+            max_voices = self.default_voices
+        key = (path, volume, max_voices)
+        handle = self.handles.get(key)
+        if handle is not None:
+            self.hits += 1
+            return handle
+
+        self.misses += 1
+        handle = BankSound(self, path, volume, max_voices)
+        self.handles[key] = handle
+        return handle
+
+    def reserve_channels(self):
+        """ Reserves the pool's channels so that Sound.play calls made outside
+        the bank, like the music, never land on them. """
+
+        total = self.channel_count + self.extra_channels
+        if pygame.mixer.get_num_channels() < total:
+            pygame.mixer.set_num_channels(total)
+        pygame.mixer.set_reserved(self.channel_count)
+        self.channels = [pygame.mixer.Channel(i) for i in range(self.channel_count)]
+        self.started = [0] * self.channel_count
+
+    def free_channel(self):
+        """ Returns the index of an idle pool channel, or steals the one that
+        has been playing the longest. """
+
+        for idx, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                return idx
+        self.steals += 1
+        return self.started.index(min(self.started))
+
+    def play(self, handle):
+        if self.listener:
+            self.listener(handle.path)
+        if not pygame.mixer.get_init():
+            return None
+        if not self.channels:
+            self.reserve_channels()
+
+        #   Forget voices that finished or were taken over by another sound
+        handle.voices = [idx for idx in handle.voices
+                         if self.channels[idx].get_busy() and self.channels[idx].get_sound() is handle.sound]
+
+        if len(handle.voices) >= handle.max_voices:
+            idx = handle.voices.pop(0)
+            self.steals += 1
+        else:
+            idx = self.free_channel()
+
+        channel = self.channels[idx]
+        channel.play(handle.sound)
+        channel.set_volume(handle.volume)
+        handle.voices.append(idx)
+
+        self.plays += 1
+        self.started[idx] = self.plays
+        return channel
+
+    def memory(self):
+        """ Approximate number of bytes of decoded PCM held by the bank. """
+
+        if not pygame.mixer.get_init():
+            return 0
+        frequency, size, channels = pygame.mixer.get_init()
+        frame_bytes = abs(size) // 8 * channels
+        return int(sum(sound.get_length() * frequency * frame_bytes for sound in self.raw.values()))
+
+    def stats(self):
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "files": len(self.raw),
+                "plays": self.plays,
+                "steals": self.steals,
+                "busy_channels": sum(1 for channel in self.channels if channel.get_busy()),
+                "bytes": self.memory()}
+
+
+sounds = SoundBank()
+
+
+class ScaleCache(object):
+    """ Bounded LRU cache of scaled surfaces, keyed by source surface and
+    target size. Asking for a surface at its own size returns it untouched. """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.passthrough = 0
+        self.evictions = 0
+
+    def scale(self, surface, size):
+        """ Drop-in replacement for pygame.transform.scale whose result is
+        shared, so callers must not modify it in place. """
+
+        size = (int(size[0]), int(size[1]))
+        if size == surface.get_size():
+            self.passthrough += 1
+            return surface
+
+        key = (surface, size)
+        scaled = self.entries.get(key)
+        if scaled is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return scaled
+
+        self.misses += 1
+        scaled = pygame.transform.scale(surface, size)
+        self.entries[key] = scaled
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return scaled
+
+    def memory(self):
+        return sum(surf.get_pitch() * surf.get_height() for surf in self.entries.values())
+
+    def stats(self):
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "passthrough": self.passthrough,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.memory()}
+
+    def clear(self):
+        self.entries.clear()
+
+
+scales = ScaleCache()
@@ -0,0 +1,124 @@
+import pygame
+
+
+class AtlasPage(object):
+    """ One large surface that sprites are packed into on shelves: rows as
+    tall as the tallest sprite placed on them, filled left to right. """
+
+    def __init__(self, like, size, padding):
+        self.size = size
+        self.padding = padding
+        flags = pygame.SRCALPHA if like.get_masks()[3] else 0
+        self.surface = pygame.Surface((size, size), flags, like)
+
+        #   [y, height, next free x] for each shelf, top to bottom
+        self.shelves = []
+        self.used = 0
+
+    def place(self, width, height):
+        """ Returns the top left corner of a free width by height rect, or
+        None if the page has no room for it. """
+
+        width += self.padding
+        height += self.padding
+        for shelf in self.shelves:
+            y, shelf_height, x = shelf
+            if height <= shelf_height and x + width <= self.size:
+                shelf[2] += width
+                self.used += width * height
+                return x, y
+        top = self.shelves[-1][0] + self.shelves[-1][1] if self.shelves else 0
+        if top + height > self.size or width > self.size:
+            return None
+        self.shelves.append([top, height, width])
+        self.used += width * height
+        return 0, top
+
+
+class TextureAtlas(object):
+    """ Packs small surfaces into a few large pages at load time and hands
+    back subsurfaces of them, so the hundreds of small sprites drawn each
+    frame read from a handful of surfaces that sit together in memory.
+
+    Surfaces are only packed alongside others with the same pixel format,
+    and each subsurface gets the colorkey and surface alpha of the surface
+    it was copied from, so a packed sprite blits exactly like the original. """
+
+    def __init__(self, page_size=512, max_sprite=128, max_pages=16, padding=1):
+        self.page_size = page_size
+        self.max_sprite = max_sprite
+        self.max_pages = max_pages
+        self.padding = padding
+
+        #   format signature -> pages of that format, oldest first
+        self.pages = {}
+
+        #   id of each packed subsurface -> the subsurface, kept alive so ids stay unique
+        self.owners = {}
+
+        self.sprites = 0
+        self.rejected = 0
+
+    def signature(self, surface):
+        return (surface.get_bitsize(), surface.get_masks())
+
+    def owns(self, surface):
+        return id(surface) in self.owners
+
+    def add(self, surface):
+        """ Returns a subsurface of a page holding a copy of surface, or
+        surface itself if it is too big or the atlas is full. """
+
+        width, height = surface.get_size()
+        if self.owns(surface) or not width or not height:
+            return surface
+        if width > self.max_sprite or height > self.max_sprite:
+            self.rejected += 1
+            return surface
+
+        pages = self.pages.setdefault(self.signature(surface), [])
+        for page in pages:
+            pos = page.place(width, height)
+            if pos is not None:
+                break
+        else:
+            if sum(len(group) for group in self.pages.values()) >= self.max_pages:
+                self.rejected += 1
+                return surface
+            page = AtlasPage(surface, self.page_size, self.padding)
+            pages.append(page)
+            pos = page.place(width, height)
+
+        #   Copy the pixels as they are, alpha channel and keyed pixels included
+        source = surface.copy()
+        source.set_colorkey(None)
+        source.set_alpha(None)
+        packed = page.surface.subsurface((pos, (width, height)))
+        packed.blit(source, (0, 0))
+        packed.set_colorkey(surface.get_colorkey())
+        packed.set_alpha(surface.get_alpha())
+
+        self.owners[id(packed)] = packed
+        self.sprites += 1
+        return packed
+
+    def memory(self):
+        return sum(page.surface.get_pitch() * page.size for group in self.pages.values() for page in group)
+
+    def stats(self):
+        pages = [page for group in self.pages.values() for page in group]
+        area = sum(page.size * page.size for page in pages)
+        return {"pages": len(pages),
+                "sprites": self.sprites,
+                "rejected": self.rejected,
+                "fill": sum(page.used for page in pages) / area if area else 0.0,
+                "bytes": self.memory()}
+
+    def clear(self):
+        self.pages = {}
+        self.owners = {}
+        self.sprites = 0
+        self.rejected = 0
+
+
+atlas = TextureAtlas()
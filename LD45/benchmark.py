@@ -0,0 +1,278 @@
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tracemalloc
+
+import numpy as np
+
+from headless import HeadlessGame, bot_script
+from enemy import Bursty, Chick
+from bullet import BasicBullet
+
+
+def invulnerable(script=None):
+    """ Wraps a script so the player never dies mid-scenario. """
+
+    def run(game, tick, inp):
+        game.player.hp = game.player.max_hp
+        if script:
+            script(game, tick, inp)
+    return run
+
+
+def active_king(game, move):
+    """ Puts the king mouse in the arena, already fighting, with its next
+    move set to the named one. """
+
+    king = list(game.king)[0]
+    game.king = set()
+    king.x, king.y = 0, -0.5
+    king.hp = 10**6
+    king.activate()
+    king.next_move = getattr(king, move) if move else None
+    king.since_last_bullet = 0
+    game.enemies = set([king])
+    game.waves = []
+    game.boss_fight_triggered = True
+    return king
+
+
+class Scenario(object):
+    """ A reproducible heavy situation: setup() arranges the game after a fresh
+    start, and frame() advances it by one frame. """
+
+    name = ""
+    script = staticmethod(invulnerable())
+
+    #   Untimed frames to run first, or None for the run's --warmup
+    warmup = None
+
+    def setup(self, game):
+        pass
+
+    def frame(self, game):
+        game.frame()
+
+
+class WaveFour(Scenario):
+    name = "wave_4"
+    script = staticmethod(invulnerable(bot_script))
+
+    def setup(self, game):
+        game.waves = game.waves[3:]
+        game.time_without_enemies = game.wave_spawn_gap
+
+
+class KingSprinkler(Scenario):
+    name = "king_sprinkler"
+
+    def setup(self, game):
+        self.king = active_king(game, "sprinkler_move")
+
+    def frame(self, game):
+        #   Keep the move going instead of letting it pick the next one
+        self.king.next_move = self.king.sprinkler_move
+        game.frame()
+
+
+class KingPulsar(Scenario):
+    name = "king_pulsar"
+
+    def setup(self, game):
+        self.king = active_king(game, "pulsar_move")
+
+    def frame(self, game):
+        self.king.next_move = self.king.pulsar_move
+        game.frame()
+
+
+class ConfettiBurst(Scenario):
+    name = "confetti_burst"
+
+    #   The burst happens on the first frame, which has to be timed
+    warmup = 0
+
+    def setup(self, game):
+        self.king = active_king(game, None)
+        self.king.hp = 1
+        self.killed = False
+
+    def frame(self, game):
+        if not self.killed:
+            bullet = BasicBullet(game, (self.king.x, self.king.y), [0, -10])
+            bullet.friendly = True
+            self.king.get_hit_by(bullet)
+            self.killed = True
+        game.frame()
+
+
+class BurstyRadial(Scenario):
+    name = "bursty_radial"
+
+    def setup(self, game):
+        game.waves = []
+        game.boss_fight_triggered = True
+        self.bursty = [Bursty(game, pos=(x, -2)) for x in (-4, 0, 4)]
+        for bursty in self.bursty:
+            bursty.hp = 10**6
+            bursty.since_last_bullet = 0
+        game.enemies = set(self.bursty)
+
+    def frame(self, game):
+        for bursty in self.bursty:
+            bursty.next_attack = 1
+            bursty.reload_time = 0.5
+        game.frame()
+
+
+class ChickSwarm(Scenario):
+    name = "chick_swarm"
+    count = 300
+
+    def setup(self, game):
+        game.waves = []
+        game.boss_fight_triggered = True
+        rng = random.Random(self.count)
+        chicks = set()
+        for i in range(self.count):
+            chick = Chick(game, pos=(rng.uniform(-10, 10), rng.uniform(-6, 6)))
+            chick.hp = 10**6
+            chicks.add(chick)
+        game.enemies = chicks
+
+
+class TitleCrowd(Scenario):
+    name = "title_crowd"
+
+    def setup(self, game):
+        game.start_title()
+        self.clock = 0
+
+    def frame(self, game):
+        dt = game.timestep.step
+        self.clock += dt
+        game.title_frame(dt, self.clock)
+
+
+SCENARIOS = [WaveFour, KingSprinkler, KingPulsar, ConfettiBurst, BurstyRadial, ChickSwarm, TitleCrowd]
+
+
+def entity_counts(game):
+    return {"bullets": len(game.bullets),
+            "particles": len(game.particles),
+            "splashes": len(game.splashes),
+            "enemies": len(game.enemies) + len(game.king),
+            "mice": len(game.mice)}
+
+
+def run_scenario(scenario_class, frames, warmup, seed, render=True):
+    """ Runs one scenario twice from the same seed: once timed, and once under
+    tracemalloc to measure how much each frame allocates. """
+
+    results = {}
+    for measure_memory in (False, True):
+        scenario = scenario_class()
+        game = HeadlessGame(script=scenario.script, render=render, seed=seed)
+        random.seed(seed)
+        game.start()
+        scenario.setup(game)
+        for i in range(warmup if scenario.warmup is None else scenario.warmup):
+            scenario.frame(game)
+
+        gc.collect()
+        gc_before = sum(stat["collections"] for stat in gc.get_stats())
+        times = []
+        allocated = []
+        peaks = {key: 0 for key in entity_counts(game)}
+        if measure_memory:
+            tracemalloc.start()
+        for i in range(frames):
+            if measure_memory:
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                scenario.frame(game)
+                allocated.append(tracemalloc.get_traced_memory()[1] - before)
+            else:
+                start = time.perf_counter()
+                scenario.frame(game)
+                times.append(time.perf_counter() - start)
+            for key, count in entity_counts(game).items():
+                peaks[key] = max(peaks[key], count)
+
+        if measure_memory:
+            tracemalloc.stop()
+            allocated = np.array(allocated)
+            results["alloc_bytes_p50"] = int(np.percentile(allocated, 50))
+            results["alloc_bytes_max"] = int(allocated.max())
+        else:
+            times = np.array(times) * 1000
+            results["frame_ms_p50"] = round(float(np.percentile(times, 50)), 3)
+            results["frame_ms_p95"] = round(float(np.percentile(times, 95)), 3)
+            results["frame_ms_p99"] = round(float(np.percentile(times, 99)), 3)
+            results["frame_ms_max"] = round(float(times.max()), 3)
+            results["gc_collections"] = sum(stat["collections"] for stat in gc.get_stats()) - gc_before
+            results["entities_peak"] = peaks
+            results["entities_end"] = entity_counts(game)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    """ Prints how each scenario's frame time percentiles moved. """
+
+    for name, result in new["scenarios"].items():
+        if name not in old["scenarios"]:
+            continue
+        before = old["scenarios"][name]
+        parts = []
+        for key in ("frame_ms_p50", "frame_ms_p95", "frame_ms_p99"):
+            change = (result[key] - before[key]) / before[key] * 100 if before[key] else 0
+            parts.append("%s %.3f -> %.3f (%+.1f%%)" % (key[-3:], before[key], result[key], change))
+        print("%-16s %s" % (name, "  ".join(parts)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the scripted performance scenarios headlessly.")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--warmup", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=45)
+    parser.add_argument("--no-render", action="store_true", help="time the simulation only")
+    parser.add_argument("--only", nargs="*", help="names of the scenarios to run")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    report = {"commit": git_commit(),
+              "python": platform.python_version(),
+              "frames": args.frames,
+              "seed": args.seed,
+              "render": not args.no_render,
+              "scenarios": {}}
+    for scenario_class in SCENARIOS:
+        if args.only and scenario_class.name not in args.only:
+            continue
+        result = run_scenario(scenario_class, args.frames, args.warmup, args.seed, not args.no_render)
+        report["scenarios"][scenario_class.name] = result
+        print("%-16s p50 %7.3fms  p95 %7.3fms  p99 %7.3fms  alloc %6.1fKB/frame  peak %s" %
+              (scenario_class.name, result["frame_ms_p50"], result["frame_ms_p95"], result["frame_ms_p99"],
+               result["alloc_bytes_p50"] / 1024.0, result["entities_peak"]))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    sys.exit()
@@ -1,73 +1,334 @@
-import pygame
+import numpy as np
+from assets import images, scales
+from spatial import SpatialGrid
+from pool import pools
+from render import BULLETS
+
 
 class Bullet(object):
+    """ Handle to one bullet. While the bullet is in a BulletPool its state
+    lives in the pool's arrays; once removed (for instance while it sits in
+    the player's pocket) the handle keeps its own copy. """
+
+    sprite_path = "bullet.png"
+    bad_sprite_path = "bad_bullet.png"
+
+    duration = 2.0
+    hit_radius = 0.35
+    damage = 1
+    knockback = 5
 
     def __init__(self, game, pos, velocity):
-        sprite_path = "bullet.png"
-        bad_sprite_path = "bad_bullet.png"
+        self.pool = None
+        self.slot = -1
+        self.reset(game, pos, velocity)
+
+    def reset(self, game, pos, velocity):
+        """ Returns a recycled bullet to the state of a freshly fired one. """
+
         self.game = game
-        self.sprite = pygame.image.load(sprite_path).convert()
-        self.bad_sprite = pygame.image.load(bad_sprite_path).convert()
-        self.sprite.set_colorkey((0, 255, 0))
-        self.bad_sprite.set_colorkey((0, 255, 0))
-        self.x, self.y = pos
-        self.velocity = velocity
-        self.friendly = False
-
-        self.since_last_shadow = 0
-        self.shadow_period = 0.02
-        self.since_shoot = 0
-        self.duration = 2.0
-        self.out_of_bounds = False
-
-        self.hit_radius = 0.35
-        self.damage = 1
-        self.knockback = 5
-
-        self.last_positions = [pos] * 10
-
-    def draw(self):
-        camera = self.game.camera
-        scale = camera.scale
-        size_original = 20
-        width = int(size_original * scale)
-        if self.friendly:
+        self._x, self._y = pos
+        self._velocity = list(velocity)
+        self._friendly = False
+        self._since_shoot = 0
+        self._out_of_bounds = False
+
+    def _get(self, name):
+        if self.pool is None:
+            return getattr(self, "_" + name)
+        return getattr(self.pool, name)[self.slot].item()
 
-            scaled = pygame.transform.scale(self.sprite, (width, width))
+    def _set(self, name, value):
+        if self.pool is None:
+            setattr(self, "_" + name, value)
         else:
-            scaled = pygame.transform.scale(self.bad_sprite, (width, width))
+            getattr(self.pool, name)[self.slot] = value
+            if name in ("x", "y"):
+                self.pool.grid_dirty = True
+
+    x = property(lambda self: self._get("x"), lambda self, value: self._set("x", value))
+    y = property(lambda self: self._get("y"), lambda self, value: self._set("y", value))
+    friendly = property(lambda self: self._get("friendly"), lambda self, value: self._set("friendly", value))
+    since_shoot = property(lambda self: self._get("since_shoot"), lambda self, value: self._set("since_shoot", value))
+    out_of_bounds = property(lambda self: self._get("out_of_bounds"),
+                             lambda self, value: self._set("out_of_bounds", value))
+
+    @property
+    def velocity(self):
+        if self.pool is None:
+            return self._velocity[:]
+        return [self.pool.vx[self.slot].item(), self.pool.vy[self.slot].item()]
+
+    @velocity.setter
+    def velocity(self, value):
+        if self.pool is None:
+            self._velocity = list(value)
+        else:
+            self.pool.vx[self.slot], self.pool.vy[self.slot] = value
+
+    def store(self):
+        """ Copies the pool's state for this bullet back onto the handle. """
+
+        self._x, self._y = self.x, self.y
+        self._velocity = self.velocity
+        self._friendly = self.friendly
+        self._since_shoot = self.since_shoot
+        self._out_of_bounds = self.out_of_bounds
+
+
+class BasicBullet(Bullet):
+    pass
+
+
+class BulletPool(object):
+    """ Struct-of-arrays storage for every live bullet. Position, velocity,
+    age and the per-bullet constants sit in contiguous numpy arrays, so
+    movement, ageing and the arena test are a handful of vector operations
+    per frame. Behaves like the set of bullets it replaces: it can be
+    iterated, tested for membership, and added to or subtracted from.
+
+    Bullets added in a batch get no handle until something asks for one, so
+    a volley costs a few slice assignments rather than an object per bullet.
+
+    Collision queries go through a spatial grid over the arena. It is rebuilt
+    at most once per update and patched as bullets come and go in between. """
+
+    def __init__(self, game, capacity=256):
+        self.game = game
+        self.count = 0
+        self.handles = []
+        self.types = []
+        self.allocate(capacity)
+
+        c = self.game.c
+        self.grid = SpatialGrid(1.0, (-c.MAJOR_RADIUS - 1, -c.MINOR_RADIUS - 3,
+                                      c.MAJOR_RADIUS + 1, c.MINOR_RADIUS + 1))
+        self.grid_dirty = True
+
+    def allocate(self, capacity):
+        """ Grows the arrays to hold capacity bullets, keeping live ones. """
+
+        def grow(old, dtype):
+            new = np.zeros(capacity, dtype=dtype)
+            if old is not None:
+                new[:self.count] = old[:self.count]
+            return new
+
+        self.capacity = capacity
+        self.x = grow(getattr(self, "x", None), np.float64)
+        self.y = grow(getattr(self, "y", None), np.float64)
+        self.last_x = grow(getattr(self, "last_x", None), np.float64)
+        self.last_y = grow(getattr(self, "last_y", None), np.float64)
+        self.vx = grow(getattr(self, "vx", None), np.float64)
+        self.vy = grow(getattr(self, "vy", None), np.float64)
+        self.since_shoot = grow(getattr(self, "since_shoot", None), np.float64)
+        self.duration = grow(getattr(self, "duration", None), np.float64)
+        self.hit_radius = grow(getattr(self, "hit_radius", None), np.float64)
+        self.damage = grow(getattr(self, "damage", None), np.float64)
+        self.friendly = grow(getattr(self, "friendly", None), np.bool_)
+        self.out_of_bounds = grow(getattr(self, "out_of_bounds", None), np.bool_)
 
-        alpha = 0
-        # for i, pos in enumerate(self.last_positions[::-1] + [[self.x, self.y]]):
-        #     x = int((pos[0] - camera.x) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_WIDTH//2)
-        #     y = int((pos[1] - camera.y) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_HEIGHT//2)
-        #     scaled.set_alpha(int(alpha))
-        #     alpha += 100/len(self.last_positions)
-        #     if pos == [self.x, self.y]:
-        #         scaled.set_alpha(255)
-        #     self.game.screen.blit(scaled, (x, y))
+    def __len__(self):
+        return self.count
 
-        x = int((self.x - camera.x) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_WIDTH//2)
-        y = int((self.y - camera.y) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_HEIGHT//2)
-        self.game.screen.blit(scaled, (x, y))
+    def __iter__(self):
+        return iter([self.handle(slot) for slot in range(self.count)])
 
-    def get_caught(self):
-        self.last_positions = [[self.x, self.y]] * 10
+    def __contains__(self, bullet):
+        return bullet.pool is self
+
+    def __isub__(self, bullets):
+        for bullet in bullets:
+            self.discard(bullet)
+        return self
+
+    def handle(self, slot):
+        """ Returns the Bullet for slot, making one if it came from a batch. """
+
+        bullet = self.handles[slot]
+        if bullet is None:
+            bullet = pools.acquire(self.types[slot], self.game, (0, 0), (0, 0))
+            bullet.pool = self
+            bullet.slot = slot
+            self.handles[slot] = bullet
+        return bullet
+
+    def add(self, bullet):
+        if bullet.pool is self:
+            return
+        if self.count == self.capacity:
+            self.allocate(self.capacity * 2)
+
+        slot = self.count
+        self.x[slot], self.y[slot] = bullet._x, bullet._y
+        self.last_x[slot], self.last_y[slot] = bullet._x, bullet._y
+        self.vx[slot], self.vy[slot] = bullet._velocity
+        self.since_shoot[slot] = bullet._since_shoot
+        self.duration[slot] = bullet.duration
+        self.hit_radius[slot] = bullet.hit_radius
+        self.damage[slot] = bullet.damage
+        self.friendly[slot] = bullet._friendly
+        self.out_of_bounds[slot] = bullet._out_of_bounds
+
+        bullet.pool = self
+        bullet.slot = slot
+        self.handles.append(bullet)
+        self.types.append(type(bullet))
+        self.count += 1
+        self.grid.insert(slot)
+        self.game.spawned(bullet)
+
+    def add_batch(self, x, y, vx, vy, friendly=False, bullet_type=BasicBullet):
+        """ Adds len(vx) bullets of bullet_type fired from (x, y). x and y may
+        be scalars or arrays. """
+
+        n = len(vx)
+        if not n:
+            return
+        capacity = self.capacity
+        while self.count + n > capacity:
+            capacity *= 2
+        if capacity != self.capacity:
+            self.allocate(capacity)
+
+        batch = slice(self.count, self.count + n)
+        self.x[batch] = x
+        self.y[batch] = y
+        self.last_x[batch] = x
+        self.last_y[batch] = y
+        self.vx[batch] = vx
+        self.vy[batch] = vy
+        self.since_shoot[batch] = 0
+        self.duration[batch] = bullet_type.duration
+        self.hit_radius[batch] = bullet_type.hit_radius
+        self.damage[batch] = bullet_type.damage
+        self.friendly[batch] = friendly
+        self.out_of_bounds[batch] = False
+
+        self.handles.extend([None] * n)
+        self.types.extend([bullet_type] * n)
+        self.count += n
+        self.grid_dirty = True
+        self.game.spawned(bullet_type, n)
+
+    def discard(self, bullet):
+        """ Takes bullet out of the pool, moving the last bullet into its
+        slot so the arrays stay packed. """
+
+        if bullet.pool is not self:
+            return
+        bullet.store()
+        slot = bullet.slot
+        last = self.count - 1
+        self.grid.remove(slot)
+        if slot != last:
+            self.grid.move(last, slot)
+            for array in (self.x, self.y, self.last_x, self.last_y, self.vx, self.vy, self.since_shoot, self.duration,
+                          self.hit_radius, self.damage, self.friendly, self.out_of_bounds):
+                array[slot] = array[last]
+            moved = self.handles[last]
+            if moved is not None:
+                moved.slot = slot
+            self.handles[slot] = moved
+            self.types[slot] = self.types[last]
+        self.handles.pop()
+        self.types.pop()
+        self.count -= 1
+
+        bullet.pool = None
+        bullet.slot = -1
+
+    def clear(self):
+        for bullet in list(self):
+            self.discard(bullet)
+
+    def snapshot(self):
+        """ Remembers positions before a simulation step, for interpolation. """
+        self.last_x[:self.count] = self.x[:self.count]
+        self.last_y[:self.count] = self.y[:self.count]
 
     def update(self, dt):
-        self.since_last_shadow += dt
-        self.since_shoot += dt
+        n = self.count
+        self.x[:n] += self.vx[:n] * dt
+        self.y[:n] += self.vy[:n] * dt
+        self.since_shoot[:n] += dt
+        self.out_of_bounds[:n] |= ~self.game.arena.inside_batch(self.x[:n], self.y[:n])
+        self.grid_dirty = True
 
-        self.x += self.velocity[0] * dt
-        self.y += self.velocity[1] * dt
+    def expired(self):
+        """ Returns the bullets that outlived their duration or left the arena. """
 
-        if self.since_last_shadow >= self.shadow_period:
-            self.last_positions.pop()
-            self.last_positions.insert(0, (self.x, self.y))
-            self.since_last_shadow -= self.shadow_period
+        n = self.count
+        dead = (self.since_shoot[:n] > self.duration[:n]) | self.out_of_bounds[:n]
+        return [self.handle(i) for i in np.flatnonzero(dead)]
 
-        if not self.game.c.in_arena_bounds([self.x, self.y]):
-            self.out_of_bounds = True
+    def refresh_grid(self):
+        if self.grid_dirty:
+            self.grid.rebuild(self.x[:self.count], self.y[:self.count])
+            self.grid_dirty = False
 
-class BasicBullet(Bullet):
-    pass
\ No newline at end of file
+    def colliding(self, x, y, radius, friendly):
+        """ Returns the set of bullets with the given allegiance that overlap a
+        circle of radius centred on (x, y). """
+
+        self.refresh_grid()
+        near = self.grid.query(x, y, radius + self.max_hit_radius())
+        if not len(near):
+            return set()
+        dist = (self.x[near] - x)**2 + (self.y[near] - y)**2
+        hit = (self.friendly[near] == friendly) & (dist < (radius + self.hit_radius[near])**2)
+        return set(self.handle(i) for i in near[hit])
+
+    def colliding_batch(self, xs, ys, radii, friendly):
+        """ colliding() for many circles at once. Returns a dict from circle
+        index to the set of bullets it overlaps; a bullet overlapping several
+        circles goes to the first. """
+
+        if not self.count or not len(xs):
+            return {}
+        self.refresh_grid()
+        circles, near = self.grid.query_batch(xs, ys, radii.max() + self.max_hit_radius())
+        if not len(near):
+            return {}
+        reach = radii[circles] + self.hit_radius[near]
+        dist = (self.x[near] - xs[circles])**2 + (self.y[near] - ys[circles])**2
+        hit = (self.friendly[near] == friendly) & (dist < reach**2)
+        circles, near = circles[hit], near[hit]
+
+        #   Keep each bullet's lowest circle index
+        order = np.lexsort((circles, near))
+        circles, near = circles[order], near[order]
+        first = np.ones(len(near), dtype=bool)
+        first[1:] = near[1:] != near[:-1]
+
+        hits = {}
+        for index, slot in zip(circles[first].tolist(), near[first].tolist()):
+            hits.setdefault(index, set()).add(self.handle(slot))
+        return hits
+
+    def max_hit_radius(self):
+        if not self.count:
+            return 0
+        return self.hit_radius[:self.count].max()
+
+    def draw(self, alpha=1.0):
+        if not self.count:
+            return
+        n = self.count
+        camera = self.game.camera
+        scale = camera.scale
+        size_original = 20
+        width = int(size_original * scale)
+        friendly_sprite = scales.scale(images.load(Bullet.sprite_path, convert=True, colorkey=(0, 255, 0)),
+                                       (width, width))
+        enemy_sprite = scales.scale(images.load(Bullet.bad_sprite_path, convert=True, colorkey=(0, 255, 0)),
+                                    (width, width))
+
+        ppt = scale * self.game.c.TILE_SIZE
+        draw_x = self.last_x[:n] + (self.x[:n] - self.last_x[:n]) * alpha
+        draw_y = self.last_y[:n] + (self.y[:n] - self.last_y[:n]) * alpha
+        xs = ((draw_x - camera.x) * ppt - width/2 + self.game.c.WINDOW_WIDTH//2).astype(int)
+        ys = ((draw_y - camera.y) * ppt - width/2 + self.game.c.WINDOW_HEIGHT//2).astype(int)
+        sprites = (enemy_sprite, friendly_sprite)
+        surfaces = [sprites[friendly] for friendly in self.friendly[:n].tolist()]
+        self.game.renderer.submit_array(surfaces, xs, ys, (width, width), BULLETS)
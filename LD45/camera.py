@@ -1,4 +1,3 @@
-import pygame
 import math
 
 class Camera(object):
@@ -6,6 +5,7 @@ class Camera(object):
     def __init__(self, game):
         self.game = game
         self.scale = 1.0
+        self.true_scale = 1.0
         self.target_scale = 1.0
         self.true_x = 0
         self.true_y = 0
@@ -13,6 +13,8 @@ class Camera(object):
         self.target_y = 0
         self.x = 0
         self.y = 0
+        self.last_view = (0, 0, 1.0)
+        self.current_view = (0, 0, 1.0)
         self.speed = 1.0
         self.tightness = 0.7
 
@@ -31,7 +33,7 @@ class Camera(object):
         return mxn, myn
 
     def mpos_frame(self):
-        return self.mouse_to_frame(pygame.mouse.get_pos())
+        return self.mouse_to_frame(self.game.get_mouse_pos())
 
     def update(self, dt):
         self.since_shake += dt
@@ -57,12 +59,27 @@ class Camera(object):
         self.x = self.true_x + xoff
         self.y = self.true_y + yoff
 
-        ds = self.target_scale - self.scale
+        ds = self.target_scale - self.true_scale
         p = 5
-        self.scale += ds * dt * p
+        self.true_scale += ds * dt * p
+        self.scale = self.true_scale
+        self.current_view = (self.x, self.y, self.scale)
 
         return dt * self.speed
 
+    def snapshot(self):
+        """ Remembers the view before a simulation step. """
+        self.last_view = self.current_view
+
+    def interpolate(self, alpha):
+        """ Places the view alpha of the way from the last snapshot to the
+        latest update, for drawing between simulation steps. """
+        x, y, scale = self.last_view
+        new_x, new_y, new_scale = self.current_view
+        self.x = x + (new_x - x) * alpha
+        self.y = y + (new_y - y) * alpha
+        self.scale = scale + (new_scale - scale) * alpha
+
     def shake_values(self):
         xoff = math.sin(self.since_shake * self.shake_freq) * self.shake_mag
         yoff = math.sin(self.since_shake * self.shake_freq) * self.shake_mag
@@ -1,25 +1,30 @@
-import pygame
 import random
 import math
-from helpers import normalize, list_subtraction, list_addition, magnitude, dist_between, angle_vec
+from helpers import normalize, list_subtraction, list_addition, magnitude, dist_between
 from bullet import BasicBullet
 from splash import Splash
-from sprite_tools import Sprite, SpriteSheet
+from sprite_tools import Sprite, sheets
 from splash import BulletSpawn
 from particle import Feather, Confettus, YouWin
+from assets import images, sounds, scales
+from pool import pools
+from patterns import Ring, Spiral, Sweep, AimedBurst, aim
+from render import ENEMIES
 
 class Enemy(object):
 
+    #   Flocking enemies are moved by the game's Flock instead of update()
+    flocks = False
+
     def __init__(self, game):
         sprite_path = "enemy.png"
         self.game = game
         self.x = 2
         self.y = 5
-        self.sprite = pygame.image.load(sprite_path)
+        self.sprite = images.load(sprite_path)
         self.width = self.sprite.get_width()
 
-        self.death_sound = pygame.mixer.Sound("bird.wav")
-        self.death_sound.set_volume(0.25)
+        self.death_sound = sounds.sound("bird.wav", volume=0.25, max_voices=3)
 
         self.deccel = 0.05
         self.velocity = [0, 0]
@@ -31,11 +36,11 @@ class Enemy(object):
 
         self.bullet_type = BasicBullet
         self.bullet_speed = 14
+        self.aimed = AimedBurst(1, self.bullet_speed)
         self.recoil_speed = 5
         self.hit_radius = (self.width/self.game.c.TILE_SIZE)/2
 
-        self.get_hit_sound = pygame.mixer.Sound("enemy_hit.wav")
-        self.get_hit_sound.set_volume(0.15)
+        self.get_hit_sound = sounds.sound("enemy_hit.wav", volume=0.15, max_voices=4)
 
         self.hp = 1
 
@@ -43,10 +48,11 @@ class Enemy(object):
         camera = self.game.camera
         scale = camera.scale
         width = int(self.width * scale)
-        x = int((self.x - camera.x) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_WIDTH//2)
-        y = int((self.y - camera.y) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_HEIGHT//2)
-        scaled = pygame.transform.scale(self.sprite, (width, width))
-        self.game.screen.blit(scaled, (x, y))
+        draw_x, draw_y = self.game.render_pos(self)
+        x = int((draw_x - camera.x) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_WIDTH//2)
+        y = int((draw_y - camera.y) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_HEIGHT//2)
+        scaled = scales.scale(self.sprite, (width, width))
+        self.game.renderer.submit(scaled, (x, y), ENEMIES)
 
     def deccelerate(self, dt):
 
@@ -75,15 +81,10 @@ class Enemy(object):
     def fire_bullet_at_player(self):
         self.since_last_bullet = 0
 
-        velocity = list_subtraction([self.game.player.x, self.game.player.y], [self.x, self.y])
-        normalize(velocity, self.bullet_speed)
-
-        push_vec = velocity[:]
-        normalize(push_vec, -self.recoil_speed)
-        self.push(*push_vec)
-        new_bullet = self.bullet_type(self.game, (self.x, self.y), velocity)
-        self.game.bullets.add(self.bullet_type(self.game, (self.x, self.y), velocity))
-        BulletSpawn(self.game, (new_bullet.x, new_bullet.y))
+        angle = aim((self.x, self.y), (self.game.player.x, self.game.player.y))
+        self.push(-math.sin(angle) * self.recoil_speed, -math.cos(angle) * self.recoil_speed)
+        self.aimed.emit(self.game, (self.x, self.y), angle=angle, bullet_type=self.bullet_type)
+        pools.acquire(BulletSpawn, self.game, (self.x, self.y))
 
 
     def push(self, x, y):
@@ -100,11 +101,14 @@ class Enemy(object):
 
 
     def check_bullet_collisions(self):
-        ceb = self.colliding_friendly_bullets()
-        for item in ceb:
+        self.take_hits(self.colliding_friendly_bullets())
+
+    def take_hits(self, bullets):
+        for item in bullets:
             self.get_hit_by(item)
 
-        self.game.bullets -= ceb
+        self.game.bullets -= bullets
+        pools.release_all(bullets)
 
     def check_enemy_collisions(self):
         for item in self.game.enemies:
@@ -114,40 +118,34 @@ class Enemy(object):
                 self.push(*direction)
 
     def colliding_friendly_bullets(self):
-        ceb = set()
-        for bullet in self.game.bullets:
-            if bullet.friendly:
-                dist = (bullet.x - self.x)**2 + (bullet.y - self.y)**2
-                if dist < (self.hit_radius + bullet.hit_radius)**2:
-                    ceb.add(bullet)
-        return ceb
+        return self.game.bullets.colliding(self.x, self.y, self.hit_radius, friendly=True)
 
     def get_hit_by(self, bullet):
         self.get_hit_sound.play()
         self.hp -= bullet.damage
         if self.hp <= 0:
             self.game.enemies_to_destroy.add(self)
-        Splash(self.game, [bullet.x, bullet.y])
+        pools.acquire(Splash, self.game, [bullet.x, bullet.y])
 
         impact_amt = bullet.velocity[:]
         normalize(impact_amt, bullet.knockback)
         self.push(*impact_amt)
 
     def check_arena_bounds(self):
-        if not self.game.c.in_arena_bounds([self.x, self.y]):
-            direction = [self.x, self.y]
-            normalize(direction, -3)
-            self.push(*direction)
+        if not self.game.arena.inside(self.x, self.y):
+            push_x, push_y = self.game.arena.push(self.x, self.y)
+            self.push(push_x * 3, push_y * 3)
 
 
 
 class Bursty(Enemy):
 
+    flocks = True
+
     def __init__(self, game, pos = (0, 0)):
         super().__init__(game)
-        idle_left = SpriteSheet("bird_idle_left.png", (8, 1), 8)
-        idle_right = SpriteSheet("bird_idle_left.png", (8, 1), 8)
-        idle_right.reverse(1, 0)
+        idle_left = sheets.get("bird_idle_left.png", (8, 1), 8)
+        idle_right = sheets.get("bird_idle_left.png", (8, 1), 8, reverse_x=True)
         self.sprite = Sprite(12)
         self.sprite.add_animation({"IdleLeft": idle_left,
                                    "IdleRight": idle_right})
@@ -165,6 +163,7 @@ class Bursty(Enemy):
         self.recoil_speed = 2
 
         self.next_attack = 0  # 0 is machine gun, 1 is burst
+        self.radial = Ring(24, 12)
 
         self.x, self.y = pos
         self.max_speed = 8
@@ -185,30 +184,27 @@ class Bursty(Enemy):
             self.clip = self.clip_size
 
     def fire_radial_bullets(self):
-        max_angle = math.pi * 2
-        n = 24
-        for i in range(n):
-            angle = i/n * max_angle
-            velocity = angle_vec(angle)
-            normalize(velocity, 12)
-            new_bullet = BasicBullet(self.game, [self.x, self.y], velocity)
-            self.game.bullets.add(new_bullet)
-        BulletSpawn(self.game, [self.x, self.y])
+        self.radial.emit(self.game, (self.x, self.y), bullet_type=self.bullet_type)
+        pools.acquire(BulletSpawn, self.game, [self.x, self.y])
 
     def draw(self):
         camera = self.game.camera
         scale = camera.scale
         width = int(self.width * scale)
-        x = int((self.x - camera.x) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_WIDTH//2)
-        y = int((self.y - camera.y) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_HEIGHT//2)
-        scaled = pygame.transform.scale(self.sprite.get_good_frame(), (width, width))
-        self.game.screen.blit(scaled, (x, y))
+        draw_x, draw_y = self.game.render_pos(self)
+        x = int((draw_x - camera.x) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_WIDTH//2)
+        y = int((draw_y - camera.y) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_HEIGHT//2)
+        scaled = scales.scale(self.sprite.get_good_frame(), (width, width))
+        self.game.renderer.submit(scaled, (x, y), ENEMIES)
 
     def move_toward_player(self, dt):
         super().move_toward_player(dt)
 
     def update(self, dt):
         super().update(dt)
+        self.animate(dt)
+
+    def animate(self, dt):
         self.sprite.update(dt)
 
         thresh = 1
@@ -222,19 +218,20 @@ class Bursty(Enemy):
         if self.hp <= 0:
             self.death_sound.play()
             for i in range(20):
-                Feather(self.game, [self.x, self.y])
+                pools.acquire(Feather, self.game, [self.x, self.y])
         else:
             for i in range(3):
-                Feather(self.game, [self.x, self.y])
+                pools.acquire(Feather, self.game, [self.x, self.y])
 
 
 class Chick(Enemy):
 
+    flocks = True
+
     def __init__(self, game, pos = (0, 0)):
         super().__init__(game)
-        idle_right = SpriteSheet("chick_idle_right.png", (6, 1), 6)
-        idle_left = SpriteSheet("chick_idle_right.png", (6, 1), 6)
-        idle_left.reverse(1, 0)
+        idle_right = sheets.get("chick_idle_right.png", (6, 1), 6)
+        idle_left = sheets.get("chick_idle_right.png", (6, 1), 6, reverse_x=True)
         self.sprite = Sprite(12)
         self.sprite.add_animation({"IdleLeft": idle_left,
                                    "IdleRight": idle_right})
@@ -252,29 +249,30 @@ class Chick(Enemy):
 
         self.hp = 2
 
-        self.shadow = pygame.image.load("shadow.png").convert()
-        self.shadow.set_alpha(80)
-        self.shadow.set_colorkey((255, 0, 0))
+        self.shadow = images.load("shadow.png", convert=True, colorkey=(255, 0, 0), alpha=80)
 
-        self.death_sound = pygame.mixer.Sound("chick.wav")
-        self.death_sound.set_volume(0.25)
+        self.death_sound = sounds.sound("chick.wav", volume=0.25, max_voices=3)
 
     def draw(self):
         camera = self.game.camera
         scale = camera.scale
         width = int(self.width * scale)
-        x = int((self.x - camera.x) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_WIDTH//2)
-        y = int((self.y - camera.y) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_HEIGHT//2)
-        scaled = pygame.transform.scale(self.sprite.get_good_frame(), (width, width))
+        draw_x, draw_y = self.game.render_pos(self)
+        x = int((draw_x - camera.x) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_WIDTH//2)
+        y = int((draw_y - camera.y) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_HEIGHT//2)
+        scaled = scales.scale(self.sprite.get_good_frame(), (width, width))
 
         soffset = 37
-        shadow = pygame.transform.scale(self.shadow, (int(self.shadow.get_width() * scale), int(self.shadow.get_height() * scale)))
-        self.game.screen.blit(shadow, (int(x + 5*scale), int(y + soffset*scale)))
+        shadow = scales.scale(self.shadow, (int(self.shadow.get_width() * scale), int(self.shadow.get_height() * scale)))
+        self.game.renderer.submit(shadow, (int(x + 5*scale), int(y + soffset*scale)), ENEMIES)
 
-        self.game.screen.blit(scaled, (x, y))
+        self.game.renderer.submit(scaled, (x, y), ENEMIES)
 
     def update(self, dt):
         super().update(dt)
+        self.animate(dt)
+
+    def animate(self, dt):
         self.sprite.update(dt)
 
         thresh = 1
@@ -288,10 +286,10 @@ class Chick(Enemy):
         if self.hp <= 0:
             self.death_sound.play()
             for i in range(10):
-                Feather(self.game, [self.x, self.y])
+                pools.acquire(Feather, self.game, [self.x, self.y])
         else:
             for i in range(3):
-                Feather(self.game, [self.x, self.y])
+                pools.acquire(Feather, self.game, [self.x, self.y])
 
 class KingMouse(Enemy):
 
@@ -303,7 +301,7 @@ class KingMouse(Enemy):
         self.y = -15.75
 
         self.sprite = Sprite(fps=8)
-        self.sprite.add_animation({"Idle": SpriteSheet("king_mouse.png", (1, 1), 1)})
+        self.sprite.add_animation({"Idle": sheets.get("king_mouse.png", (1, 1), 1)})
         self.sprite.start_animation("Idle")
         self.width = self.sprite.get_good_frame().get_width()
 
@@ -332,6 +330,10 @@ class KingMouse(Enemy):
         self.since_last_bullet = -2
         self.sprink_angle = 0
         self.sprink_angle_increase = math.pi * 2 / 32
+        self.sprinkler = Sweep(2, self.bullet_speed, self.sprink_angle_increase, self.clip_size)
+        #   Each pulse turns by half the gap between bullets, so consecutive
+        #   pulses fill each other's gaps
+        self.pulsar = Spiral(48, self.bullet_speed, math.pi / 48)
 
         self.sprinkler_move = 0
         self.pulsar_move = 1
@@ -340,17 +342,15 @@ class KingMouse(Enemy):
     def random_move(self):
         self.mode = self.follow_player_mode
         self.clip = 100
-        return random.choice([self.sprinkler_move, self.pulsar_move])
+        move = random.choice([self.sprinkler_move, self.pulsar_move])
+        self.game.mark("king_move", move="sprinkler" if move == self.sprinkler_move else "pulsar")
+        return move
 
     def check_bullet_behavior(self):
         if self.next_move == self.sprinkler_move:
             if self.clip and self.since_last_bullet > 0.06:
-                self.shoot_bullet_in_direction(self.sprink_angle)
-                self.shoot_bullet_in_direction(self.sprink_angle + math.pi)
-                if self.clip > 50:
-                    self.sprink_angle += self.sprink_angle_increase
-                else:
-                    self.sprink_angle -= self.sprink_angle_increase
+                #   The two streams' recoil cancels out, so none is applied
+                self.fire_pattern(self.sprinkler, self.clip_size - self.clip)
                 self.clip -= 1
             elif not self.clip:
                 self.since_last_bullet = -3
@@ -359,24 +359,16 @@ class KingMouse(Enemy):
             self.mode = self.follow_position_mode
             self.target_x, self.target_y = (0, 0)
             if self.clip > 0 and self.since_last_bullet > 0.8:
-                for i in range(48):
-                    self.since_last_bullet = 0
-                    self.shoot_bullet_in_direction(i/48 * math.pi * 2)
+                self.fire_pattern(self.pulsar, (self.clip_size - self.clip) // 40)
                 self.clip -= 40
             elif self.clip <= 0:
                 self.since_last_bullet = -3
                 self.next_move = self.random_move()
 
-    def shoot_bullet_in_direction(self, angle):
+    def fire_pattern(self, pattern, shot=0):
         self.since_last_bullet = 0
-        velocity = angle_vec(angle)
-        normalize(velocity, self.bullet_speed)
-        push_vec = velocity[:]
-        normalize(push_vec, -self.recoil_speed)
-        self.push(*push_vec)
-        new_bullet = self.bullet_type(self.game, (self.x, self.y), velocity)
-        self.game.bullets.add(self.bullet_type(self.game, (self.x, self.y), velocity))
-        BulletSpawn(self.game, (new_bullet.x, new_bullet.y))
+        pattern.emit(self.game, (self.x, self.y), shot, self.sprink_angle, bullet_type=self.bullet_type)
+        pools.acquire(BulletSpawn, self.game, (self.x, self.y))
 
     def activate(self):
         self.active = True
@@ -414,19 +406,22 @@ class KingMouse(Enemy):
         if self.mode == self.follow_player_mode:
             super().move_toward_player(dt)
 
-    def draw(self):
+    def draw(self, layer=ENEMIES):
+        """ Queues the king on layer; the title screen puts it over the
+        crowd instead of under it. """
         camera = self.game.camera
         scale = camera.scale
         width = int(self.width * scale)
-        x = int((self.x - camera.x) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_WIDTH//2)
-        y = int((self.y - camera.y) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_HEIGHT//2)
-        scaled = pygame.transform.scale(self.sprite.get_good_frame(), (width, width))
-        self.game.screen.blit(scaled, (x, y))
+        draw_x, draw_y = self.game.render_pos(self)
+        x = int((draw_x - camera.x) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_WIDTH//2)
+        y = int((draw_y - camera.y) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_HEIGHT//2)
+        scaled = scales.scale(self.sprite.get_good_frame(), (width, width))
+        self.game.renderer.submit(scaled, (x, y), layer)
 
     def get_hit_by(self, bullet):
         super().get_hit_by(bullet)
         if self.hp <= 0:
             #self.death_sound.play()
             for i in range(70):
-                Confettus(self.game, [self.x, self.y])
-            YouWin(self.game, [self.x, self.y])
\ No newline at end of file
+                pools.acquire(Confettus, self.game, [self.x, self.y])
+            pools.acquire(YouWin, self.game, [self.x, self.y])
\ No newline at end of file
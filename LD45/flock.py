@@ -0,0 +1,120 @@
+import numpy as np
+from spatial import SpatialGrid
+
+
+class Flock(object):
+    """ Moves every enemy with flocks set (chicks and bursties) in one batch:
+    seeking the player, the speed limit, the push back into the arena and
+    separation from other enemies are array operations over the whole crowd.
+    Separation only tests pairs of enemies in touching grid cells.
+
+    Drag, shooting and getting hit stay per enemy, drag so that it comes
+    before the recoil of a shot, as in Enemy.update. The enemies keep their
+    own x, y and velocity between ticks, so pushes from bullets and recoil
+    work as before. """
+
+    def __init__(self, game, cell_size=2.5):
+        self.game = game
+        c = game.c
+        self.bounds = (-c.MAJOR_RADIUS - 1, -c.MINOR_RADIUS - 3, c.MAJOR_RADIUS + 1, c.MINOR_RADIUS + 1)
+        self.grid = SpatialGrid(cell_size, self.bounds)
+        self.separation = 2
+        self.arena_push = 3
+
+        #   Below this many enemies, testing every pair beats the grid
+        self.grid_threshold = 32
+
+    def update(self, dt):
+        members = [enemy for enemy in self.game.enemies if enemy.flocks]
+        if not members:
+            return
+        n = len(members)
+
+        for enemy in members:
+            enemy.deccelerate(dt)
+            enemy.since_last_bullet += dt
+            enemy.check_bullet_behavior()
+
+        x = np.fromiter((enemy.x for enemy in members), float, n)
+        y = np.fromiter((enemy.y for enemy in members), float, n)
+        vx = np.fromiter((enemy.velocity[0] for enemy in members), float, n)
+        vy = np.fromiter((enemy.velocity[1] for enemy in members), float, n)
+        accel = np.fromiter((enemy.accel for enemy in members), float, n)
+        max_speed = np.fromiter((enemy.max_speed for enemy in members), float, n)
+
+        #   Accelerate toward the player
+        player = self.game.player
+        dx = player.x - x
+        dy = player.y - y
+        d = np.hypot(dx, dy)
+        step = accel * dt
+        still = d == 0
+        d[still] = 1
+        vx += np.where(still, step, dx / d * step)
+        vy += np.where(still, 0, dy / d * step)
+
+        speed = np.hypot(vx, vy)
+        over = speed > max_speed
+        if over.any():
+            vx[over] *= max_speed[over] / speed[over]
+            vy[over] *= max_speed[over] / speed[over]
+
+        outside = ~self.game.arena.inside_batch(x, y)
+        if outside.any():
+            push_x, push_y = self.game.arena.push_batch(x[outside], y[outside])
+            vx[outside] += push_x * self.arena_push
+            vy[outside] += push_y * self.arena_push
+
+        x += vx * dt
+        y += vy * dt
+
+        push_x, push_y = self.separate(members, x, y)
+        vx += push_x
+        vy += push_y
+
+        for i, enemy in enumerate(members):
+            enemy.x = x[i].item()
+            enemy.y = y[i].item()
+            enemy.velocity = [vx[i].item(), vy[i].item()]
+
+        radius = np.fromiter((enemy.hit_radius for enemy in members), float, n)
+        hits = self.game.bullets.colliding_batch(x, y, radius, friendly=True)
+        for i, bullets in hits.items():
+            members[i].take_hits(bullets)
+        for enemy in members:
+            enemy.animate(dt)
+
+    def separate(self, members, x, y):
+        """ Returns the push each member gets from every enemy it overlaps,
+        including enemies outside the flock, like the king. """
+
+        others = [enemy for enemy in self.game.enemies if not enemy.flocks]
+        all_x = np.concatenate((x, [enemy.x for enemy in others]))
+        all_y = np.concatenate((y, [enemy.y for enemy in others]))
+        radius = np.array([enemy.hit_radius for enemy in members] + [enemy.hit_radius for enemy in others])
+
+        push_x = np.zeros(len(all_x))
+        push_y = np.zeros(len(all_x))
+        if len(all_x) < self.grid_threshold:
+            i, j = np.triu_indices(len(all_x), 1)
+        else:
+            reach = 2 * radius.max()
+            if reach > self.grid.cell_size:
+                self.grid = SpatialGrid(reach, self.bounds)
+            self.grid.rebuild(all_x, all_y)
+            i, j = self.grid.pairs()
+        if len(i):
+            dx = all_x[i] - all_x[j]
+            dy = all_y[i] - all_y[j]
+            d = np.hypot(dx, dy)
+            touching = d < radius[i] + radius[j]
+            i, j, dx, dy, d = i[touching], j[touching], dx[touching], dy[touching], d[touching]
+            same = d == 0
+            d[same] = 1
+            fx = np.where(same, 1, dx / d) * self.separation
+            fy = np.where(same, 0, dy / d) * self.separation
+            np.add.at(push_x, i, fx)
+            np.add.at(push_y, i, fy)
+            np.add.at(push_x, j, -fx)
+            np.add.at(push_y, j, -fy)
+        return push_x[:len(members)], push_y[:len(members)]
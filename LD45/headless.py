@@ -0,0 +1,238 @@
+import os
+import sys
+import time
+import math
+import random
+import argparse
+
+#   Must be set before pygame creates a window or opens the audio device
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+from main import Game
+from helpers import dist_between_lists
+from pool import pools
+from atlas import atlas
+
+
+class NullSound(object):
+    """ Stands in for the music tracks, which a headless run never plays. """
+
+    def play(self, *args, **kwargs):
+        pass
+
+    def fadeout(self, *args):
+        pass
+
+    def set_volume(self, *args):
+        pass
+
+
+class KeyState(object):
+    """ Indexable like pygame.key.get_pressed(), backed by a set of keys. """
+
+    def __init__(self, held):
+        self.held = held
+
+    def __getitem__(self, key):
+        return key in self.held
+
+
+class ScriptedInput(object):
+    """ Keyboard and mouse state driven by a script instead of the user. The
+    mouse is aimed in world coordinates and converted to the screen at the
+    moment the game reads it, since the camera keeps moving. """
+
+    def __init__(self):
+        self.held = set()
+        self.buttons = [False, False, False]
+        self.aim = (0, 0)
+        self.presses = []
+
+    def press(self, key):
+        self.presses.append(key)
+
+    def take_events(self):
+        events = [pygame.event.Event(pygame.KEYDOWN, key=key) for key in self.presses]
+        self.presses = []
+        return events
+
+
+def bot_script(game, tick, inp):
+    """ Default script: circles the middle of the arena, aims at the nearest
+    enemy, holds the trigger, and dodges into incoming bullets to pick up
+    ammo. """
+
+    player = game.player
+    angle = tick / game.timestep.rate * 0.8
+    target = (math.cos(angle) * 5, math.sin(angle) * 3)
+
+    #   Run at the closest incoming bullet while the pocket has room
+    if len(player.bullets_collected) < player.pocket_size:
+        incoming = game.bullets.colliding(player.x, player.y, 4, friendly=False)
+        if incoming:
+            nearest = min(incoming, key=lambda b: dist_between_lists([b.x, b.y], [player.x, player.y]))
+            target = (nearest.x, nearest.y)
+
+    inp.held = set()
+    if target[0] < player.x - 0.5:
+        inp.held.add(player.left_key)
+    elif target[0] > player.x + 0.5:
+        inp.held.add(player.right_key)
+    if target[1] < player.y - 0.5:
+        inp.held.add(player.up_key)
+    elif target[1] > player.y + 0.5:
+        inp.held.add(player.down_key)
+
+    enemies = list(game.enemies)
+    if enemies:
+        nearest = min(enemies, key=lambda e: dist_between_lists([e.x, e.y], [player.x, player.y]))
+        inp.aim = (nearest.x, nearest.y)
+    inp.buttons[0] = True
+
+    if game.bullets.colliding(player.x, player.y, 1, friendly=False):
+        inp.press(player.dodge_key)
+
+
+class StopRun(Exception):
+    pass
+
+
+class HeadlessGame(Game):
+    """ Runs the fight without a window or sound card and as fast as the
+    simulation allows. Input comes from a script, and by default nothing is
+    drawn, so the tick rate measures simulation alone. """
+
+    def __init__(self, script=bot_script, render=False, seed=0, sim_rate=None):
+        self.sim_rate = sim_rate
+        self.script = script
+        self.draw_frames = render
+        self.input = ScriptedInput()
+        self.ticks = 0
+        self.tick_budget = None
+        random.seed(seed)
+        self.setup()
+
+    def load_music(self):
+        self.menu_music = NullSound()
+        self.fight_music = NullSound()
+
+    def get_events(self):
+        pygame.event.pump()
+        return self.input.take_events()
+
+    def get_keys(self):
+        return KeyState(self.input.held)
+
+    def get_mouse_buttons(self):
+        return tuple(self.input.buttons)
+
+    def get_mouse_pos(self):
+        camera = self.camera
+        ppt = self.c.TILE_SIZE * camera.scale
+        x = (self.input.aim[0] - camera.x) * ppt + self.c.WINDOW_WIDTH/2
+        y = (self.input.aim[1] - camera.y) * ppt + self.c.WINDOW_HEIGHT/2
+        return int(x), int(y)
+
+    def frame_time(self):
+        #   Every frame is exactly one simulation step
+        return self.timestep.step
+
+    def tick(self, dt):
+        if self.tick_budget is not None and self.ticks >= self.tick_budget:
+            raise StopRun()
+        if self.script:
+            self.script(self, self.ticks, self.input)
+        self.ticks += 1
+        return super().tick(dt)
+
+    def render(self):
+        if self.draw_frames:
+            super().render()
+
+    def present(self):
+        pass
+
+    def start(self):
+        """ Sets up a fresh fight, the way the title screen hands over to it. """
+
+        self.reset_things()
+        self.camera.focus_mode = True
+        self.camera.true_x = self.camera.x = 0
+        self.camera.true_y = self.camera.y = -12
+        self.logo_y = -1000
+        self.start_fight()
+
+    def frame(self):
+        """ Runs one frame of the fight, starting a new one after a reset. """
+
+        self.update_and_draw_things(self.frame_time())
+        if self.reset_flag and self.shade_alpha >= 250:
+            self.reset_flag = False
+            self.start()
+
+    def run(self, ticks):
+        """ Steps the fight for the given number of ticks and returns the
+        number of ticks per second of wall time. Restarts when the player
+        dies, so every tick is spent fighting. """
+
+        self.ticks = 0
+        self.tick_budget = ticks
+        self.start()
+        start = time.perf_counter()
+        try:
+            while True:
+                if self.player.dead and not self.reset_flag:
+                    self.reset()
+                self.frame()
+        except StopRun:
+            pass
+        elapsed = time.perf_counter() - start
+        self.tick_budget = None
+        return self.ticks / elapsed if elapsed else float("inf")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Step the game without a display and report the tick rate.")
+    parser.add_argument("--ticks", type=int, default=6000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--render", action="store_true", help="also draw each frame to an offscreen surface")
+    parser.add_argument("--profile", action="store_true", help="print the time spent in each stage of a frame")
+    parser.add_argument("--trace", help="write frame telemetry to this file (.json for a Chrome trace)")
+    parser.add_argument("--hitch-budget", type=float, help="report the worst frames longer than this many ms")
+    parser.add_argument("--sim-rate", type=int, help="simulation steps per second")
+    args = parser.parse_args()
+
+    game = HeadlessGame(render=args.render, seed=args.seed, sim_rate=args.sim_rate)
+    if args.trace:
+        game.record_telemetry(args.trace)
+    if args.hitch_budget:
+        game.hitches.enable(args.hitch_budget / 1000.0)
+    if args.profile:
+        game.profiler.set_history(args.ticks)
+        game.profiler.set_enabled(True)
+    tps = game.run(args.ticks)
+    print("%s ticks in %.2fs: %.0f ticks per second (%.1fx real time)" %
+          (game.ticks, game.ticks / tps, tps, tps / game.timestep.rate))
+    for name, (mean, worst) in game.profiler.averages().items():
+        print("  %-10s %7.3f ms  max %7.3f ms" % (name, mean, worst))
+    if args.profile:
+        for name, stats in sorted(pools.stats().items()):
+            print("  pool %-12s %s" % (name, stats))
+        for line in game.preloader.report()[-1:]:
+            print("  assets     %s" % line)
+        stats = atlas.stats()
+        print("  atlas      %s sprites on %s pages, %.0f%% filled, %s too big or left out" %
+              (stats["sprites"], stats["pages"], stats["fill"] * 100, stats["rejected"]))
+        if args.render:
+            print("  render     %s" % ", ".join("%s %.1f" % item for item in game.renderer.stats().items()))
+    if game.hitches.enabled:
+        print("%s frames over %.1f ms" % (game.hitches.count, args.hitch_budget))
+        for hitch in game.hitches.worst():
+            print(hitch.summary())
+    if game.telemetry:
+        game.telemetry.close()
+        print("%s records written to %s, %s dropped" % (game.telemetry.written, args.trace, game.telemetry.dropped))
+    pygame.quit()
+    sys.exit()
@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+from collections import deque
+
+
+class Hitch(object):
+    """ One frame that went over budget, with the spawn and sound events that
+    happened during it. events holds (kind, name, count, stack) tuples. """
+
+    def __init__(self, frame, seconds, events):
+        self.frame = frame
+        self.seconds = seconds
+        self.events = events
+
+    def summary(self):
+        lines = ["frame %s took %.2f ms" % (self.frame, self.seconds * 1000)]
+        if not self.events:
+            lines.append("    no spawn or sound events")
+        for kind, name, count, stack in self.events:
+            lines.append("    %3dx %-5s %-12s %s" % (count, kind, name, " < ".join(stack)))
+        return "\n".join(lines)
+
+    def as_dict(self):
+        return {"frame": self.frame,
+                "ms": round(self.seconds * 1000, 3),
+                "events": [{"kind": kind, "name": name, "count": count, "stack": list(stack)}
+                           for kind, name, count, stack in self.events]}
+
+
+class HitchDetector(object):
+    """ Notes spawn and sound events as they happen and, when a frame runs
+    over budget, keeps the ones from that frame as a Hitch. Each event is
+    keyed by where it came from, a few caller frames deep, so a burst of 70
+    identical spawns shows up as one line with a count.
+
+    Off by default; note() returns straight away while it is off. """
+
+    def __init__(self, budget=1/60.0, stack_depth=5, keep=100):
+        self.enabled = False
+        self.budget = budget
+        self.stack_depth = stack_depth
+        self.hitches = deque(maxlen=keep)
+        self.count = 0
+        self.listeners = []
+        self.frame = 0
+        self.frame_start = None
+        self.events = {}
+        self.filenames = {}
+
+    def enable(self, budget=None):
+        if budget is not None:
+            self.budget = budget
+        self.enabled = True
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.frame += 1
+        self.frame_start = time.perf_counter()
+        self.events = {}
+
+    def note(self, kind, name, skip=1, count=1):
+        """ Records count events of kind ("spawn", "sound") called name. skip
+        is how many frames above the caller belong to the hook and are left
+        out of the stack. """
+
+        if not self.enabled:
+            return
+        stack = []
+        frame = sys._getframe(skip + 1)
+        while frame is not None and len(stack) < self.stack_depth:
+            code = frame.f_code
+            filename = self.filenames.get(code.co_filename)
+            if filename is None:
+                filename = self.filenames[code.co_filename] = os.path.basename(code.co_filename)
+            stack.append("%s:%s %s" % (filename, frame.f_lineno, code.co_name))
+            frame = frame.f_back
+        key = (kind, name, tuple(stack))
+        self.events[key] = self.events.get(key, 0) + count
+
+    def end_frame(self):
+        """ Closes the frame and returns a Hitch if it was over budget. """
+
+        if not self.enabled or self.frame_start is None:
+            return None
+        seconds = time.perf_counter() - self.frame_start
+        self.frame_start = None
+        if seconds <= self.budget:
+            return None
+
+        events = sorted(((kind, name, count, stack) for (kind, name, stack), count in self.events.items()),
+                        key=lambda event: -event[2])
+        hitch = Hitch(self.frame, seconds, events)
+        self.hitches.append(hitch)
+        self.count += 1
+        for listener in self.listeners:
+            listener(hitch)
+        return hitch
+
+    def worst(self, count=5):
+        return sorted(self.hitches, key=lambda hitch: -hitch.seconds)[:count]
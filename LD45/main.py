@@ -1,78 +1,233 @@
+import os
 import pygame
 import sys
 from map import Map
 from camera import Camera
 from player import Player
 from enemy import Enemy, Bursty, Chick, KingMouse
-from helpers import dist_between_lists
 import time
 from splash import BulletSpawn
-from mouse import Mouse
+from mouse import MouseCrowd
 from helpers import magnitude, list_subtraction, normalize
 import math
+import argparse
+from bullet import BulletPool
+from particle import ParticleSystem
+from timestep import FixedTimestep
+from assets import images, sounds
+from profiler import FrameProfiler
+from telemetry import TelemetryWriter
+from hitch import HitchDetector
+from pool import pools
+from arena import ArenaField, EllipseArena
+from flock import Flock
+from render import RenderQueue, OVERLAY
+from preload import AssetPreloader
+from archive import AssetArchive
+from atlas import atlas
+from pacing import FramePacer
+from timeline import Timeline
 
 
 class Game(object):
 
-    def __init__(self):
-        pygame.mixer.init(buffer = 128)
-        pygame.init()
+    archive_path = "assets.pak"
+
+    #   Frame rate every loop is held to, and whether to sync flips to the display
+    fps = 60
+    vsync = False
+
+    #   Simulation steps per second, or None for Constants.SIM_RATE
+    sim_rate = None
+
+    def __init__(self, trace=None, hitch_budget=None, load_report=False, fps=None, vsync=False, sim_rate=None):
+        if fps is not None:
+            self.fps = fps
+        self.vsync = vsync
+        self.sim_rate = sim_rate
+        self.start_loading()
+        if trace:
+            self.record_telemetry(trace)
+        if hitch_budget:
+            self.hitches.enable(hitch_budget)
+            self.hitches.listeners.append(lambda hitch: print(hitch.summary()))
+        self.splash()
+        self.finish_loading()
+        if load_report:
+            print("\n".join(self.preloader.report()))
 
-        self.menu_music = pygame.mixer.Sound("menu.wav")
-        self.menu_music.set_volume(0.25)
-        self.fight_music = pygame.mixer.Sound("fight.wav")
-        self.fight_music.set_volume(0.5)
-        self.king_land_sound = pygame.mixer.Sound("king_land.wav")
-        self.king_land_sound.set_volume(0.28)
-        self.logo = pygame.image.load("ammodillo.png")
-        self.press_enter = pygame.image.load("press_enter.png")
-        self.enter_game_sound = pygame.mixer.Sound("enter_game.wav")
-        self.enter_game_sound.set_volume(0.3)
-        self.game_over = pygame.image.load("game_over.png")
-        self.game_over = pygame.transform.scale(self.game_over, (self.game_over.get_width()*3//4, self.game_over.get_height()*3//4))
-        self.reset_sound = pygame.mixer.Sound("reset_sound.wav")
-        self.reset_sound.set_volume(0.3)
-        self.fish_logo = pygame.transform.scale(pygame.image.load("star_fish.png"), (400, 400))
+        while True:
+            self.title()
+            self.main()
 
+    def setup(self):
+        """ Loads everything straight away, without a splash screen. """
+        self.start_loading()
+        self.finish_loading()
 
-        self.c = Constants()
+    def start_loading(self):
+        """ Opens the window and sets up what the splash screen needs, then
+        starts decoding every image and sound in the background. """
+        pygame.mixer.init(buffer = 128)
+        pygame.init()
 
-        self.screen = pygame.display.set_mode(self.c.WINDOW_SIZE)
+        self.c = Constants()
+        self.screen = self.open_window()
         pygame.display.set_caption("Ammodillo")
+        self.renderer = RenderQueue(self.screen)
+        self.pacer = FramePacer(self.fps, vsync=self.vsync)
+        self.sim_rate = self.sim_rate or self.c.SIM_RATE
+        self.timestep = FixedTimestep(self.sim_rate)
+        self.rate_changed = 0
+
+        self.profiler = FrameProfiler(budget=self.pacer.period or 1/60.0)
+        self.profiler_key = pygame.K_F3
+        self.telemetry = None
+        self.hitches = HitchDetector()
+        self.hitches.listeners.append(self.log_hitch)
+        sounds.listener = self.sound_played
+
+        self.archive = self.open_archive()
+        images.atlas = atlas
+        self.fish_logo = pygame.transform.scale(images.load("star_fish.png"), (400, 400))
+        self.preloader = AssetPreloader(images, sounds)
+        self.preloader.start()
+
+    def open_window(self):
+        """ Opens the window, synced to the display if vsync was asked for and
+        the driver supports it. """
+        if self.vsync:
+            try:
+                return pygame.display.set_mode(self.c.WINDOW_SIZE, pygame.SCALED, vsync=1)
+            except pygame.error:
+                print("vsync is not available here; pacing with the frame limiter instead")
+                self.vsync = False
+        return pygame.display.set_mode(self.c.WINDOW_SIZE)
+
+    def open_archive(self):
+        """ Serves images and sounds from the baked asset archive, if there is
+        one and it is newer than the files it was baked from. """
+        if not self.archive_path or not os.path.exists(self.archive_path):
+            return None
+        archive = AssetArchive(self.archive_path)
+        stale = archive.stale()
+        if stale:
+            print("%s is out of date (%s changed); rebuild it with archive.py" % (self.archive_path, ", ".join(stale)))
+            return None
+        images.archive = archive
+        sounds.archive = archive
+        return archive
+
+    def finish_loading(self):
+        """ Waits for any files still decoding, then builds the rest of the
+        game from the warm caches. """
+        self.preloader.wait()
+
+        self.load_music()
+        self.king_land_sound = sounds.sound("king_land.wav", volume=0.28, max_voices=1)
+        self.logo = images.load("ammodillo.png")
+        self.press_enter = images.load("press_enter.png")
+        self.enter_game_sound = sounds.sound("enter_game.wav", volume=0.3, max_voices=1)
+        self.game_over = images.load("game_over.png")
+        self.game_over = pygame.transform.scale(self.game_over, (self.game_over.get_width()*3//4, self.game_over.get_height()*3//4))
+        self.reset_sound = sounds.sound("reset_sound.wav", volume=0.3, max_voices=1)
+
+        self.arena = ArenaField(EllipseArena(self.c.MAJOR_RADIUS, self.c.MINOR_RADIUS,
+                                             openings=[(self.c.CENTER_ARCH, 2)]),
+                                (-self.c.MAJOR_RADIUS - 4, -self.c.MINOR_RADIUS - 6,
+                                 self.c.MAJOR_RADIUS + 4, self.c.MINOR_RADIUS + 4))
 
         self.camera = Camera(self)
         self.player = Player(self)
         self.map = Map(self)
+        self.flock = Flock(self)
+        self.timeline = Timeline()
+
+        #   Counts snapshots, so render_pos can tell a fresh one from a stale one
+        self.snapshots = 0
+
+        #   What one simulation step updates and one frame draws, in order, as
+        #   (profiler scope, stage) pairs
+        self.update_stages = [("waves", self.update_waves),
+                              ("player", self.update_player),
+                              ("particles", self.update_particles),
+                              ("enemies", self.update_enemies),
+                              ("mice", self.update_mice),
+                              ("bullets", self.update_bullets),
+                              ("splashes", self.update_splashes),
+                              ("timeline", self.timeline.update),
+                              ("overlay", self.update_overlay)]
+        self.draw_stages = [("map", self.draw_map),
+                            ("particles", self.draw_particles),
+                            ("enemies", self.draw_enemies),
+                            ("player", self.draw_player),
+                            ("mice", self.draw_mice),
+                            ("bullets", self.draw_bullets),
+                            ("splashes", self.draw_splashes),
+                            ("overlay", self.draw_overlay)]
+
+    def record_telemetry(self, path):
+        """ Streams frame timings and gameplay events to path. """
+
+        self.telemetry = TelemetryWriter(path)
+        self.profiler.attach(self.telemetry)
+
+    def mark(self, name, **args):
+        """ Notes a gameplay event in the telemetry stream, if one is open. """
+
+        if self.telemetry:
+            self.telemetry.event(name, args)
+
+    def log_hitch(self, hitch):
+        if self.telemetry:
+            self.telemetry.event("hitch", hitch.as_dict())
+
+    def spawned(self, thing, count=1):
+        """ Called when a particle, splash or bullet is created, so that the
+        hitch detector can tie slow frames to what spawned in them. thing may
+        also be a class, for count objects spawned in one batch. """
+
+        name = thing.__name__ if isinstance(thing, type) else type(thing).__name__
+        self.hitches.note("spawn", name, skip=2, count=count)
+
+    def sound_played(self, path):
+        self.hitches.note("sound", path, skip=3)
+
+    def load_music(self):
+        self.menu_music = sounds.decode("menu.wav")
+        self.menu_music.set_volume(0.25)
+        self.fight_music = sounds.decode("fight.wav")
+        self.fight_music.set_volume(0.5)
 
-        start = time.time()
+    def splash(self):
+        self.reset_clock()
+        elapsed = 0
         while True:
             self.screen.fill((0, 0, 0))
             pygame.display.flip()
 
             self.check_for_quit_event()
-            if time.time() - start > 0.25:
+            elapsed += self.frame_time()
+            if elapsed > 0.25:
                 break
 
-        start = time.time()
+        elapsed = 0
         logo_duration = 3
         transition = 1
-        end = start + logo_duration
         self.fish_logo.set_alpha(0)
         while True:
             self.check_for_quit_event()
 
-            now = time.time()
-            if now >= end:
+            if elapsed >= logo_duration:
                 break
-            elif now >= end - transition:
-                to_end = end - now
+            elif elapsed >= logo_duration - transition:
+                to_end = logo_duration - elapsed
                 alpha = 255 * to_end/transition
                 self.fish_logo.set_alpha(int(alpha))
-                print(alpha)
-            elif now >= start + transition:
+            elif elapsed >= transition:
                 pass
             else:
-                alpha = 255 * (now - start)/transition
+                alpha = 255 * elapsed/transition
                 self.fish_logo.set_alpha(int(alpha))
 
             self.screen.fill((0, 0, 0))
@@ -80,91 +235,107 @@ class Game(object):
             y = self.c.WINDOW_HEIGHT//2 - self.fish_logo.get_height()//2
             self.screen.blit(self.fish_logo, (x, y))
             pygame.display.flip()
+            elapsed += self.frame_time()
 
-        start = time.time()
+        elapsed = 0
         while True:
             self.screen.fill((0, 0, 0))
             pygame.display.flip()
 
             self.check_for_quit_event()
-            if time.time() - start > 0.5:
+            elapsed += self.frame_time()
+            if elapsed > 0.5:
                 break
 
-        while True:
-            self.title()
-            self.main()
-
     def title(self):
         self.reset_things()
         self.fight_music.fadeout(1000)
         self.menu_music.play(-1, fade_ms=1000)
 
-        self.camera.focus_mode = True
-        start_y = -12
-        self.camera.x = 0
-        self.camera.y = start_y
-        self.camera.target_x = 0
-        self.camera.target_y = start_y
-        self.camera.true_x = 0
-        self.camera.true_y = start_y
-
-        shady_boi = pygame.Surface(self.c.WINDOW_SIZE).convert()
-        shady_boi.fill((0, 0, 0))
-        sb_alpha = 255
-        sb_rate = 200
+        self.start_title()
 
         end_loop = False
 
-        then = time.time()
-        time.sleep(0.001)
-
+        self.reset_clock()
 
         while True:
 
-            now = time.time()
-            dt = now - then
-            then = now
-
-            sb_alpha = max(0, sb_alpha - sb_rate * dt)
-            shady_boi.set_alpha(sb_alpha)
+            dt = self.frame_time()
 
+            self.profiler.begin_frame()
+            self.hitches.begin_frame()
             events = self.check_for_quit_event()
             for event in events:
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_RETURN:
                         self.enter_game_sound.play()
                         end_loop = True
+                    if event.key == self.profiler_key:
+                        self.profiler.toggle()
 
             if end_loop:
                 break
 
-            yoff = math.sin(time.time() * 0.85) * 0.8
-            self.camera.target_y = start_y + yoff
+            self.title_frame(dt, time.time())
+            self.profiler.draw(self.screen)
+            self.present()
+            if self.profiler.enabled:
+                self.profiler.end_frame(self.entity_counts())
+            self.hitches.end_frame()
+
+    def start_title(self):
+        self.camera.focus_mode = True
+        self.title_start_y = -12
+        self.camera.x = 0
+        self.camera.y = self.title_start_y
+        self.camera.target_x = 0
+        self.camera.target_y = self.title_start_y
+        self.camera.true_x = 0
+        self.camera.true_y = self.title_start_y
+
+        self.shady_boi = pygame.Surface(self.c.WINDOW_SIZE).convert()
+        self.shady_boi.fill((0, 0, 0))
+        self.sb_alpha = 255
+
+    def title_frame(self, dt, now):
+        """ Updates and draws one frame of the title screen; now is the clock
+        time that drives the bobbing and blinking. """
+        sb_rate = 200
+        self.sb_alpha = max(0, self.sb_alpha - sb_rate * dt)
+        self.shady_boi.set_alpha(self.sb_alpha)
+
+        yoff = math.sin(now * 0.85) * 0.8
+        self.camera.target_y = self.title_start_y + yoff
+        with self.profiler.scope("camera"):
             self.camera.update(dt)
 
+        with self.profiler.scope("map"):
             self.map.draw()
-            for mouse in self.mice:
-                mouse.update(dt)
-                mouse.draw()
+        with self.profiler.scope("mice"):
+            self.mice.update(dt)
+            self.mice.draw()
+        with self.profiler.scope("enemies"):
             for king in self.king:
                 king.update(dt)
-                king.draw()
-            yoff = math.sin((time.time() - 1.2) * 0.8) * 12
-            self.logo_y = self.c.WINDOW_HEIGHT - 210 + yoff
-            self.screen.blit(self.logo, ((self.c.WINDOW_WIDTH - self.logo.get_width())//2 + int(100 * self.camera.x),
-                                         self.logo_y))
-            if time.time() % 1 < 0.5:
-                self.screen.blit(self.press_enter, ((self.c.WINDOW_WIDTH - self.press_enter.get_width())//2, self.c.WINDOW_HEIGHT - 50))
-            self.screen.blit(shady_boi, (0, 0))
-            pygame.display.flip()
+                king.draw(OVERLAY)
+        yoff = math.sin((now - 1.2) * 0.8) * 12
+        self.logo_y = self.c.WINDOW_HEIGHT - 210 + yoff
+        self.renderer.submit(self.logo, ((self.c.WINDOW_WIDTH - self.logo.get_width())//2 + int(100 * self.camera.x),
+                                         self.logo_y), OVERLAY)
+        if now % 1 < 0.5:
+            self.renderer.submit(self.press_enter, ((self.c.WINDOW_WIDTH - self.press_enter.get_width())//2,
+                                                    self.c.WINDOW_HEIGHT - 50), OVERLAY)
+        self.renderer.submit(self.shady_boi, (0, 0), OVERLAY)
+        with self.profiler.scope("blit"):
+            self.renderer.flush()
 
 
     def reset_things(self):
+        self.timeline.clear()
         self.boss_fight_animation = False
         self.enemies = set()
-        self.bullets = set()
-        self.particles = set()
-        self.mice = set()
+        self.bullets = BulletPool(self)
+        self.particles = ParticleSystem(self)
         self.king = set()
         self.player = Player(self)
         self.fight_music.set_volume(0.5)
@@ -172,8 +343,7 @@ class Game(object):
         self.reset_flag = False
         self.boss_fight_triggered = False
 
-        for p in self.c.MOUSE_POSITIONS:
-            self.mice.add(Mouse(self, p))
+        self.mice = MouseCrowd(self, self.c.MOUSE_POSITIONS)
 
         self.wave_spawn_gap = 5
         self.last_hype = 0
@@ -213,103 +383,44 @@ class Game(object):
 
     def main(self):
 
-        then = time.time()
-        time.sleep(0.001)
-
         self.menu_music.fadeout(1000)
         self.fight_music.play(-1, fade_ms = 2000)
 
+        self.start_fight()
+
+        self.reset_clock()
+        while True:
+            self.update_and_draw_things(self.frame_time())
+            if self.reset_flag and self.shade_alpha >= 250:
+                self.reset_flag = False
+                break
+
+    def start_fight(self):
         self.camera.focus_mode = False
         self.time_without_enemies = 0
 
         self.enemies_to_destroy = set()
-        self.bullets = set()
+        self.bullets = BulletPool(self)
         self.splashes = set()
         self.splashes_to_destroy = set()
 
-        fpss = [0] * 100
         self.cam_start_pos = self.camera.y
 
-        while True:
-
-            now = time.time()
-            dt = now - then
-            then = now
-
-            # Measure fps
-            fpss.pop()
-            fpss.insert(0, 1/dt)
-            if time.time()%1 < 0.01:
-                pass#print("FPS: %s" % (min(fpss)))
-
-            # Do stuff
-            dt = self.camera.update(dt)
-            self.check_global_events(dt)
-            if self.reset_flag and self.shade_alpha >= 250:
-                self.reset_flag = False
-                break
-            self.player.update(dt)
-            self.update_shade(dt)
-
-            self.logo_y -= dt * 300
-
-            # Draw stuff
-            self.map.draw()
-            for particle in self.particles:
-                particle.update(dt)
-                particle.draw()
-            for enemy in self.enemies | self.king:
-                enemy.update(dt)
-                enemy.draw()
-            self.player.draw()
-            self.enemies -= self.enemies_to_destroy
-            if len(self.enemies_to_destroy):
-                self.last_hype = -2
-            self.enemies_to_destroy = set()
-            for mouse in self.mice:
-                mouse.update(dt)
-                mouse.draw()
-            for bullet in self.bullets:
-                bullet.update(dt)
-                bullet.draw()
-            dead_bullets = set([b for b in self.bullets if b.since_shoot > b.duration or b.out_of_bounds])
-            for dead_bullet in dead_bullets:
-                BulletSpawn(self, [dead_bullet.x, dead_bullet.y])
-            self.bullets -= dead_bullets
-            self.splashes -= self.splashes_to_destroy
-            for splash in self.splashes:
-                splash.update(dt)
-                splash.draw()
-            if self.logo_y > -200:
-                self.screen.blit(self.logo,
-                                 ((self.c.WINDOW_WIDTH - self.logo.get_width()) // 2 - int(15 * self.camera.x),
-                                  self.logo_y - (15 * (self.camera.y - self.cam_start_pos))))
-            if self.shade_alpha:
-                self.screen.blit(self.shade, (0, 0))
-            if self.player.dead and not self.reset_flag:
-                self.screen.blit(self.game_over, (self.c.WINDOW_WIDTH // 2 - self.game_over.get_width() // 2,
-                                                  self.c.WINDOW_HEIGHT // 2 - self.game_over.get_height() // 2))
-            pygame.display.flip()
-
-    def boss_fight(self):
+    def king_entrance(self):
+        """ Timeline script for the start of the boss fight: the camera pans
+        to the king, who leaps out of the stands and lands in the arena. """
         self.boss_fight_animation = True
         self.boss_fight_triggered = True
 
         king = list(self.king)[0]
         self.player.stun(3)
+        self.mark("boss_fight", phase="focus")
 
-        then = time.time()
-        time.sleep(0.001)
         timer = 0
         self.camera.focus_mode = True
         self.camera.set_target_pos([king.x, king.y])
         while True:
-            now = time.time()
-            dt = now - then
-            then = now
-
-            timer += dt
-            self.update_and_draw_things(dt)
+            timer += yield
 
             if magnitude(self.player.velocity) < 2:
                 diff = list_subtraction([0, 5], [self.player.x, self.player.y])
@@ -326,68 +437,35 @@ class Game(object):
                 self.player.velocity = [0.01, 0]
                 break
 
-        timer = 0
-        while True:
-            now = time.time()
-            dt = now - then
-            then = now
-
-            timer += dt
-            self.update_and_draw_things(dt)
-            if timer >= 0.5:
-                break
+        self.mark("boss_fight", phase="pause")
+        yield 0.5
 
         king.x = 0
         king.y = -30
         king.velocity = [0, 35]
+        self.mark("boss_fight", phase="drop")
 
-        while True:
-            now = time.time()
-            dt = now - then
-            then = now
-
-            timer += dt
-            self.update_and_draw_things(dt)
-            if king.y > -0.5:
-                king.y = -0.5
-                king.velocity = [0, 0]
-                self.camera.shake(1.2)
-                self.king_land_sound.play()
-                break
+        while king.y <= -0.5:
+            yield
+        king.y = -0.5
+        king.velocity = [0, 0]
+        self.camera.shake(1.2)
+        self.king_land_sound.play()
 
-        timer = 0
-        while True:
-            now = time.time()
-            dt = now - then
-            then = now
-
-            timer += dt
-            self.update_and_draw_things(dt)
-            if timer >= 1:
-                king.activate()
-                break
+        self.mark("boss_fight", phase="landed")
+        yield 1
+        king.activate()
 
         self.boss_fight_animation = False
 
         self.king = set()
         self.enemies = set([king])
+        self.mark("boss_fight", phase="fight")
         while True:
-            now = time.time()
-            dt = now - then
-            then = now
-
-            timer += dt
-            self.update_and_draw_things(dt)
-
+            yield
             if not self.enemies:
                 self.last_hype = -1
 
-            if self.reset_flag and self.shade_alpha > 250:
-                break
-
-
-
-
     def hype(self):
         return self.last_hype < 0
 
@@ -402,10 +480,22 @@ class Game(object):
     def reset(self):
         self.reset_flag = True
 
-    def check_global_events(self, dt):
+    def get_events(self):
         events = pygame.event.get()
         pygame.event.pump()
-        for event in events:
+        return events
+
+    def get_keys(self):
+        return pygame.key.get_pressed()
+
+    def get_mouse_buttons(self):
+        return pygame.mouse.get_pressed()
+
+    def get_mouse_pos(self):
+        return pygame.mouse.get_pos()
+
+    def check_global_events(self):
+        for event in self.get_events():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -416,68 +506,227 @@ class Game(object):
                 if event.key == pygame.K_r or event.key == pygame.K_RETURN and not self.boss_fight_animation:
                     self.reset()
                     self.reset_sound.play()
-
-        self.update_shade(dt)
+                if event.key == self.profiler_key:
+                    self.profiler.toggle()
                 # if event.key == pygame.K_l:
                 #     print("Mouse position: " + str(self.camera.mouse_to_frame(pygame.mouse.get_pos())))
 
+    def update_waves(self, dt):
+        self.update_shade(dt)
+
         if not self.enemies:
             self.time_without_enemies += dt
         if self.time_without_enemies >= self.wave_spawn_gap:
             self.time_without_enemies = 0
             if len(self.waves):
-                self.enemies |= set(self.waves.pop(0))
+                wave = self.waves.pop(0)
+                self.mark("wave_spawn", remaining=len(self.waves),
+                          enemies=[type(enemy).__name__ for enemy in wave])
+                self.enemies |= set(wave)
                 self.player.hp = min(self.player.max_hp, self.player.hp + 1)
             elif not self.boss_fight_triggered and not self.reset_flag and not self.player.dead:
                 self.player.hp = min(self.player.max_hp, self.player.hp + 1)
-                self.boss_fight()
+                self.timeline.play(self.king_entrance())
 
         self.last_hype += dt
 
-        if dt > 0.05:
-            return 0.05
-
-        return dt * self.camera.speed
+    def reset_clock(self):
+        self.pacer.start()
+
+    def frame_time(self):
+        """ Waits until the next frame is due, then returns the seconds of
+        real time since the previous one. """
+        dt = self.pacer.wait()
+        self.adapt_sim_rate()
+        return dt
+
+    def adapt_sim_rate(self):
+        """ Steps the simulation rate down while frames run over budget, and
+        back up towards sim_rate once there is room again, at most once a
+        second. The game runs at the same speed either way. """
+        pacer = self.pacer
+        if not pacer.period or pacer.frames - self.rate_changed < pacer.fps:
+            return
+        rate = self.timestep.rate
+        if pacer.average_headroom < 0.05 and rate > self.c.MIN_SIM_RATE:
+            rate = max(self.c.MIN_SIM_RATE, rate - self.c.SIM_RATE_STEP)
+        elif pacer.average_headroom > 0.5 and rate < self.sim_rate:
+            rate = min(self.sim_rate, rate + self.c.SIM_RATE_STEP)
+        else:
+            return
+        self.timestep.set_rate(rate)
+        self.rate_changed = pacer.frames
+        self.mark("sim_rate", rate=rate)
+
+    def entity_counts(self):
+        """ Live entities by type, plus last frame's draw statistics, for the
+        profiler overlay. """
+
+        counts = {"bullets": len(self.bullets),
+                  "particles": len(self.particles),
+                  "mice": len(self.mice)}
+        if hasattr(self, "splashes"):
+            counts["splashes"] = len(self.splashes)
+        for group in (self.enemies, self.king):
+            for enemy in group:
+                name = type(enemy).__name__
+                counts[name] = counts.get(name, 0) + 1
+        counts.update(self.renderer.last)
+        if self.pacer.period:
+            counts["headroom_pct"] = int(self.pacer.headroom * 100)
+        return counts
+
+    def snapshot(self):
+        """ Remembers where everything was before a simulation step, so that
+        frames drawn between steps can be interpolated. """
+        self.camera.snapshot()
+        self.snapshots += 1
+        self.remember_position(self.player)
+        for group in (self.enemies, self.king):
+            for enemy in group:
+                self.remember_position(enemy)
+        self.bullets.snapshot()
+
+    def remember_position(self, thing):
+        thing.last_x = thing.x
+        thing.last_y = thing.y
+        thing.snapshot_number = self.snapshots
+
+    def render_pos(self, thing):
+        """ Position to draw thing at, between its last two simulated states.
+        Things the latest snapshot missed, like enemies that spawned during
+        the step, are drawn where they are. """
+        if getattr(thing, "snapshot_number", None) != self.snapshots:
+            return thing.x, thing.y
+        alpha = self.timestep.alpha
+        x, y = thing.last_x, thing.last_y
+        return x + (thing.x - x) * alpha, y + (thing.y - y) * alpha
+
+    def tick(self, dt):
+        """ Advances the simulation by one fixed step of dt seconds, running
+        each update stage in turn. Returns the step's length after the
+        camera's slow motion. """
+        profile = self.profiler.scope
+        self.snapshot()
+        with profile("camera"):
+            dt = self.camera.update(dt)
+        for name, stage in self.update_stages:
+            with profile(name):
+                stage(dt)
+        return dt
 
-    def update_and_draw_things(self, dt):
-        # Do stuff
-        dt = self.camera.update(dt)
-        self.check_global_events(dt)
+    def update_player(self, dt):
         self.player.update(dt)
 
-        # Draw stuff
-        self.map.draw()
-        for particle in self.particles:
-            particle.update(dt)
-            particle.draw()
-        for enemy in self.enemies | self.king:
-            enemy.update(dt)
-            enemy.draw()
-        self.player.draw()
-        self.enemies -= self.enemies_to_destroy
-        if len(self.enemies_to_destroy):
+    def update_particles(self, dt):
+        self.particles.update(dt)
+
+    def update_enemies(self, dt):
+        self.flock.update(dt)
+        for group in (self.enemies, self.king):
+            for enemy in group:
+                if not enemy.flocks:
+                    enemy.update(dt)
+        if self.enemies_to_destroy:
+            self.enemies -= self.enemies_to_destroy
             self.last_hype = -2
-        self.enemies_to_destroy = set()
-        for mouse in self.mice:
-            mouse.update(dt)
-            mouse.draw()
-        for bullet in self.bullets:
-            bullet.update(dt)
-            bullet.draw()
-        dead_bullets = set([b for b in self.bullets if b.since_shoot > b.duration or b.out_of_bounds])
-        for dead_bullet in dead_bullets:
-            BulletSpawn(self, [dead_bullet.x, dead_bullet.y])
-        self.bullets -= dead_bullets
-        self.splashes -= self.splashes_to_destroy
+            self.enemies_to_destroy.clear()
+
+    def update_mice(self, dt):
+        self.mice.update(dt)
+
+    def update_bullets(self, dt):
+        self.bullets.update(dt)
+        dead_bullets = self.bullets.expired()
+        if dead_bullets:
+            for dead_bullet in dead_bullets:
+                pools.acquire(BulletSpawn, self, [dead_bullet.x, dead_bullet.y])
+            self.bullets -= dead_bullets
+            pools.release_all(dead_bullets)
+
+    def update_splashes(self, dt):
+        if self.splashes_to_destroy:
+            self.splashes -= self.splashes_to_destroy
+            pools.release_all(self.splashes_to_destroy)
+            self.splashes_to_destroy.clear()
         for splash in self.splashes:
             splash.update(dt)
-            splash.draw()
+
+    def update_overlay(self, dt):
+        """ Scrolls the title logo away and fades the shade in. The boss fight
+        leaves the shade to update_waves alone, so it fades in at half speed. """
+        if not self.boss_fight_triggered:
+            self.update_shade(dt)
+        self.logo_y -= dt * 300
+
+    def render(self):
+        """ Draws one frame, running each draw stage in turn. """
+        profile = self.profiler.scope
+        self.camera.interpolate(self.timestep.alpha)
+        for name, stage in self.draw_stages:
+            with profile(name):
+                stage()
+        with profile("blit"):
+            self.renderer.flush()
+
+    def draw_map(self):
+        self.map.draw()
+
+    def draw_particles(self):
+        self.particles.draw()
+
+    def draw_enemies(self):
+        for group in (self.enemies, self.king):
+            for enemy in group:
+                enemy.draw()
+
+    def draw_player(self):
+        self.player.draw()
+
+    def draw_mice(self):
+        self.mice.draw()
+
+    def draw_bullets(self):
+        self.bullets.draw(self.timestep.alpha)
+
+    def draw_splashes(self):
+        for splash in self.splashes:
+            if splash not in self.splashes_to_destroy:
+                splash.draw()
+
+    def draw_overlay(self):
+        if self.logo_y > -200:
+            self.renderer.submit(self.logo,
+                                 ((self.c.WINDOW_WIDTH - self.logo.get_width()) // 2 - int(15 * self.camera.x),
+                                  self.logo_y - (15 * (self.camera.y - self.cam_start_pos))), OVERLAY)
         if self.shade_alpha:
-            self.screen.blit(self.shade, (0, 0))
+            self.renderer.submit(self.shade, (0, 0), OVERLAY)
         if self.player.dead and not self.reset_flag:
-            self.screen.blit(self.game_over, (self.c.WINDOW_WIDTH // 2 - self.game_over.get_width() // 2,
-                                              self.c.WINDOW_HEIGHT // 2 - self.game_over.get_height() // 2))
-        pygame.display.flip()
+            self.renderer.submit(self.game_over, (self.c.WINDOW_WIDTH // 2 - self.game_over.get_width() // 2,
+                                                  self.c.WINDOW_HEIGHT // 2 - self.game_over.get_height() // 2),
+                                 OVERLAY)
+
+    def update_and_draw_things(self, frame_dt):
+        """ Runs as many fixed simulation steps as frame_dt calls for, then
+        draws one frame. Returns the simulated time that passed. """
+        self.profiler.begin_frame()
+        self.hitches.begin_frame()
+        with self.profiler.scope("events"):
+            self.check_global_events()
+        elapsed = 0
+        for i in range(self.timestep.advance(frame_dt)):
+            elapsed += self.tick(self.timestep.step)
+        self.render()
+        self.profiler.draw(self.screen)
+        self.present()
+        if self.profiler.enabled:
+            self.profiler.end_frame(self.entity_counts())
+        self.hitches.end_frame()
+        return elapsed
+
+    def present(self):
+        with self.profiler.scope("flip"):
+            pygame.display.flip()
 
 class Constants(object):
     def __init__(self):
@@ -491,6 +740,12 @@ class Constants(object):
         self.LEFT_ARCH = (-7, -6)
         self.RIGHT_ARCH = (7, -6)
 
+        #   Simulation steps per second, independent of the frame rate, and
+        #   how far and in what steps it may drop while frames run long
+        self.SIM_RATE = 120
+        self.MIN_SIM_RATE = 60
+        self.SIM_RATE_STEP = 20
+
         self.MAJOR_RADIUS = 12
         self.MINOR_RADIUS = 8
 
@@ -528,14 +783,19 @@ class Constants(object):
                                 (13.536390235395956, -6.480127384397375)]
         self.MOUSE_POSITIONS = [(i[0], i[1] - 0.25) for i in self.MOUSE_POSITIONS]
 
-    def in_arena_bounds(self, pos):
-        x, y = pos
-        thresh = 0.5
-        if dist_between_lists(pos, self.CENTER_ARCH) < 2:
-            return True
-        return x**2/((self.MAJOR_RADIUS - thresh)**2) + y**2/((self.MINOR_RADIUS - thresh)**2) <= 1
-
 
 if __name__ == "__main__":
-
-    Game()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Ammodillo")
+    parser.add_argument("--trace", help="write frame telemetry to this file (.json for a Chrome trace, "
+                                        "otherwise JSON lines)")
+    parser.add_argument("--hitch-budget", type=float, help="print what spawned or played during any frame "
+                                                           "longer than this many milliseconds")
+    parser.add_argument("--load-report", action="store_true", help="print how long each asset took to load")
+    parser.add_argument("--fps", type=int, help="frame rate to cap every screen at, or 0 to run uncapped "
+                                                "(default %s)" % Game.fps)
+    parser.add_argument("--vsync", action="store_true", help="sync frames to the display's refresh")
+    parser.add_argument("--sim-rate", type=int, help="simulation steps per second (default %s)" % Constants().SIM_RATE)
+    args = parser.parse_args()
+
+    Game(trace=args.trace, hitch_budget=args.hitch_budget and args.hitch_budget / 1000.0,
+         load_report=args.load_report, fps=args.fps, vsync=args.vsync, sim_rate=args.sim_rate)
\ No newline at end of file
@@ -1,4 +1,6 @@
 import pygame
+from assets import images
+from render import BACKGROUND
 
 
 class Map(object):
@@ -17,33 +19,82 @@ class Map(object):
 
 
 class Tile(object):
+    """ Colosseum and sky backdrop. Both images are rendered into cached layers
+    that are only rebuilt when the on-screen size changes, so panning and sky
+    parallax cost a plain blit each. """
 
     def __init__(self, game, pos):
         path = "colosseum.png"
         sky = "sky.png"
         self.game = game
-        self.sprite = pygame.image.load(path)
-        self.sky_sprite = pygame.image.load(sky)
+        self.sprite = images.load(path)
+        self.sky_sprite = images.load(sky)
         self.w, self.h = self.sprite.get_width(), self.sprite.get_height()
         self.sw, self.sh = self.sky_sprite.get_width(), self.sky_sprite.get_height()
         self.y = -4.3
         self.x = 0
         #self.width = self.game.c.TILE_SIZE
 
+        self.mips = self.build_mips(path, self.sprite.convert_alpha)
+
+        #   Plain white behind the sky, for when it doesn't cover the window
+        self.backdrop = pygame.Surface(self.game.c.WINDOW_SIZE).convert()
+        self.backdrop.fill((255, 255, 255))
+        self.sky_mips = self.build_mips(sky, self.sky_sprite.convert)
+
+        self.layer_size = None
+        self.layer = None
+        self.sky_layer_size = None
+        self.sky_layer = None
+
+    def build_mips(self, path, prepare, min_size=64):
+        """ Returns a list of successively halved copies of the surface that
+        prepare() makes from path, largest first, to scale layers down from.
+        They are shared through the image cache, so an asset archive can
+        hold them ready made. """
+
+        mips = [images.derived("%s mip 0" % path, prepare)]
+        while min(mips[-1].get_size()) // 2 >= min_size:
+            last = mips[-1]
+            size = (last.get_width()//2, last.get_height()//2)
+            mips.append(images.derived("%s mip %s" % (path, len(mips)),
+                                       lambda: pygame.transform.smoothscale(last, size)))
+        return mips
+
+    def from_mips(self, mips, size):
+        """ Scales the smallest mip level that is at least size. """
+
+        source = mips[0]
+        for mip in mips:
+            if mip.get_width() >= size[0] and mip.get_height() >= size[1]:
+                source = mip
+        if source.get_size() == size:
+            return source
+        return pygame.transform.scale(source, size)
+
+    def get_layers(self, scale):
+        size = (int(self.w * scale), int(self.h * scale))
+        if size != self.layer_size:
+            self.layer = self.from_mips(self.mips, size)
+            self.layer_size = size
+        sky_size = (int(self.sw * scale / 1.5), int(self.sh * scale / 1.5))
+        if sky_size != self.sky_layer_size:
+            self.sky_layer = self.from_mips(self.sky_mips, sky_size)
+            self.sky_layer_size = sky_size
+        return self.sky_layer, self.layer
+
     def draw(self, camera):
         scale = camera.scale
-        width = int(self.w * scale)
-        height = int(self.h * scale)
-        swidth = int(self.sw * scale / 1.5)
-        sheight = int(self.sh * scale / 1.5)
+        sky_layer, layer = self.get_layers(scale)
+        width, height = self.layer_size
         x = int((self.x - camera.x) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_WIDTH//2)
         y = int((self.y - camera.y) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_HEIGHT//2)
         sx = x//3 - (width * scale)//50
         sy = y//4 + (height*scale)//50
-        # if x + width < 0 or y + width < 0 or x > self.game.c.WINDOW_WIDTH or y > self.game.c.WINDOW_HEIGHT:
-        #     return
-        self.game.screen.fill((255, 255, 255))
-        scaled = pygame.transform.scale(self.sky_sprite, (swidth, sheight))
-        self.game.screen.blit(scaled, (sx, sy))
-        scaled = pygame.transform.scale(self.sprite, (width, height))
-        self.game.screen.blit(scaled, (x, y))
+
+        #   Only clear the screen when the sky doesn't already cover it
+        swidth, sheight = self.sky_layer_size
+        if sx > 0 or sy > 0 or sx + swidth < self.game.c.WINDOW_WIDTH or sy + sheight < self.game.c.WINDOW_HEIGHT:
+            self.game.renderer.submit(self.backdrop, (0, 0), BACKGROUND)
+        self.game.renderer.submit(sky_layer, (sx, sy), BACKGROUND)
+        self.game.renderer.submit(layer, (x, y), BACKGROUND)
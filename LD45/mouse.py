@@ -1,68 +1,141 @@
-from sprite_tools import Sprite, SpriteSheet
-import pygame
 import random
+import pygame
+import numpy as np
+from sprite_tools import sheets
+from assets import images, scales
+from render import CROWD
 
-class Mouse(object):
 
-    second_jump_chance = 0.06
+class MouseCrowd(object):
+    """ The spectator mice in the stands. Positions, coat and jump state live
+    in arrays, every mouse uses one of two shared sheets, and they all share
+    one idle animation clock.
 
-    def __init__(self, game, pos):
+    The stands are split into small groups of neighbouring mice. Each group
+    keeps its seated mice pre-drawn into a run-length encoded layer, one per
+    animation frame, which is only redrawn when one of its mice jumps or
+    lands or the zoom changes. Jumping mice are drawn on their own on top. """
 
-        self.x, self.y = pos
+    second_jump_chance = 0.06
+    hype_jump_chance = 1.5
+    fps = 4
+    group_size = 5
+
+    def __init__(self, game, positions):
         self.game = game
+        self.count = len(positions)
+        self.x = np.array([pos[0] for pos in positions], dtype=float)
+        self.y = np.array([pos[1] for pos in positions], dtype=float)
 
-        self.sprite = Sprite(fps=4)
-        path = random.choice(["mouse.png", "mouse_brown.png"])
-        idle = SpriteSheet(path, (2, 1), 2)
-        self.sprite.add_animation({"Idle": idle})
-        self.sprite.start_animation("Idle")
+        paths = ["mouse.png", "mouse_brown.png"]
+        self.sheets = [sheets.get(path, (2, 1), 2) for path in paths]
+        self.coat = np.array([paths.index(random.choice(paths)) for pos in positions])
+        self.rng = np.random.default_rng(random.getrandbits(32))
 
-        self.jumping = False
+        self.jumping = np.zeros(self.count, dtype=bool)
+        self.since_jump = np.full(self.count, 100.0)
+        self.yoff = np.zeros(self.count)
         self.jump_period = 0.25
         self.jump_height = 1.25
-        self.yoff = 0
-        self.since_jump = 100
-        self.jump_func = lambda x: (-((x - self.jump_period/2)/(self.jump_period/2))**2 + 1) * self.jump_height
+        self.clock = 0
+
+        frame = self.sheets[0].get_frame(0)
+        self.w, self.h = frame.get_width(), frame.get_height()
+        self.shadow = images.load("shadow.png", convert=True, colorkey=(255, 0, 0), alpha=80)
+        self.shadow_offset = 30
 
-        self.w = self.sprite.get_good_frame().get_width()
-        self.h = self.sprite.get_good_frame().get_height()
+        #   Groups run along the stands, each drawn back to front
+        along = np.argsort(self.x, kind="stable")
+        self.groups = []
+        for start in range(0, self.count, self.group_size):
+            members = along[start:start + self.group_size]
+            self.groups.append(members[np.argsort(self.y[members], kind="stable")])
+        self.order = np.argsort(self.y, kind="stable")
 
-        self.shadow = pygame.image.load("shadow.png").convert()
-        self.shadow.set_alpha(80)
-        self.shadow.set_colorkey((255, 0, 0))
+        self.zoom_key = None
+        self.layers = [{} for group in self.groups]
+        self.layer_builds = 0
 
-    def jump(self):
-        self.jumping = True
-        self.since_jump = 0
+    def __len__(self):
+        return self.count
 
     def update(self, dt):
-        self.sprite.update(dt)
+        self.clock += dt
         self.since_jump += dt
 
-        s2jc = self.second_jump_chance if not self.game.hype() else 1.5
+        chance = (self.hype_jump_chance if self.game.hype() else self.second_jump_chance) * dt
+        start = ~self.jumping & (self.rng.random(self.count) < chance)
+        landed = self.jumping & (self.since_jump > self.jump_period)
+        self.since_jump[start] = 0
+        self.jumping = (self.jumping & ~landed) | start
 
-        if not self.jumping:
-            chance = s2jc * dt
-            if random.random() < chance:
-                self.jump()
-        else:
-            if self.since_jump > self.jump_period:
-                self.jumping = False
-                self.yoff = 0
-            else:
-                self.yoff = self.jump_func(self.since_jump)
+        half = self.jump_period / 2
+        self.yoff = np.where(self.jumping, (-((self.since_jump - half) / half)**2 + 1) * self.jump_height, 0)
+
+    def frames(self, width, height):
+        index = int(self.clock * self.fps)
+        return [scales.scale(sheet.get_frame(index), (width, height)) for sheet in self.sheets]
+
+    def build_layer(self, members, ppt, frames, shadow):
+        """ Draws the seated mice among members into a new layer. Returns the
+        layer and the world position of its top left corner. """
+
+        seated = members[~self.jumping[members]]
+        width, height = frames[0].get_size()
+        left = self.x[members].min()
+        top = self.y[members].min()
+        soffset = self.shadow_offset * ppt / self.game.c.TILE_SIZE
+        size = (int((self.x[members].max() - left) * ppt) + max(width, shadow.get_width()) + 1,
+                int((self.y[members].max() - top) * ppt + soffset) + max(height, shadow.get_height()) + 1)
+        layer = pygame.Surface(size, pygame.SRCALPHA)
+        layer.fill((0, 0, 0, 0))
+
+        blits = []
+        for i in seated:
+            x = int((self.x[i] - left) * ppt)
+            y = int((self.y[i] - top) * ppt)
+            blits.append((shadow, (x, int(y + soffset))))
+            blits.append((frames[self.coat[i]], (x, y)))
+        layer.blits(blits, doreturn=False)
+
+        #   Mostly empty layers blit much faster encoded
+        layer.set_alpha(255, pygame.RLEACCEL)
+        self.layer_builds += 1
+        return layer, left, top
 
     def draw(self):
-        camera = self.game.camera
+        game = self.game
+        camera = game.camera
         scale = camera.scale
         width = int(self.w * scale)
         height = int(self.h * scale)
-        x = int((self.x - camera.x) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_WIDTH//2)
-        y = int((self.y - self.yoff - camera.y) * scale * self.game.c.TILE_SIZE - height/2 + self.game.c.WINDOW_HEIGHT//2)
-        scaled = pygame.transform.scale(self.sprite.get_good_frame(), (width, height))
+        shadow = scales.scale(self.shadow, (int(self.shadow.get_width() * scale),
+                                            int(self.shadow.get_height() * scale)))
+        frames = self.frames(width, height)
+
+        #   Small zoom changes reuse the layers; the error stays under a pixel
+        ppt = round(scale * game.c.TILE_SIZE, 2)
+        if (ppt, width, height) != self.zoom_key:
+            self.zoom_key = (ppt, width, height)
+            self.layers = [{} for group in self.groups]
 
-        soffset = 30
-        shadow = pygame.transform.scale(self.shadow, (int(self.shadow.get_width() * scale), int(self.shadow.get_height() * scale)))
-        self.game.screen.blit(shadow, (int(x - 0*scale), int(y + soffset*scale)))
+        true_ppt = scale * game.c.TILE_SIZE
+        x_origin = game.c.WINDOW_WIDTH//2 - width/2
+        y_origin = game.c.WINDOW_HEIGHT//2 - height/2
+        renderer = game.renderer
+        for members, layers in zip(self.groups, self.layers):
+            key = (frames[0], self.jumping[members].tobytes())
+            if key not in layers:
+                if len(layers) >= 8:
+                    layers.clear()
+                layers[key] = self.build_layer(members, ppt, frames, shadow)
+            layer, left, top = layers[key]
+            renderer.submit(layer, (int((left - camera.x) * true_ppt + x_origin),
+                                    int((top - camera.y) * true_ppt + y_origin)), CROWD)
 
-        self.game.screen.blit(scaled, (x, y))
\ No newline at end of file
+        soffset = self.shadow_offset * scale
+        for i in self.order[self.jumping[self.order]]:
+            x = int((self.x[i] - camera.x) * true_ppt + x_origin)
+            y = int((self.y[i] - self.yoff[i] - camera.y) * true_ppt + y_origin)
+            renderer.submit(shadow, (x, int(y + soffset)), CROWD)
+            renderer.submit(frames[self.coat[i]], (x, y), CROWD)
@@ -0,0 +1,89 @@
+import time
+
+
+class FramePacer(object):
+    """ Caps a loop at a target frame rate without pegging a core. Each call
+    to wait() sleeps until shortly before the next frame is due and spins on
+    the clock for the last stretch, since sleeps can overshoot by a
+    millisecond or more. How far ahead of the deadline it stops sleeping is
+    learned from how late past sleeps woke up.
+
+    With vsync the display flip already blocks until the next refresh, so
+    wait() only measures. Either way it keeps track of headroom: the share of
+    the frame budget left over after the frame's own work. """
+
+    def __init__(self, fps=60, vsync=False, min_spin=0.0005, max_spin=0.004):
+        self.vsync = vsync
+        self.min_spin = min_spin
+        self.max_spin = max_spin
+        self.spin = max_spin / 2
+        self.set_fps(fps)
+
+        self.frames = 0
+        self.late = 0
+        self.slept = 0
+        self.spun = 0
+        self.headroom = 1.0
+        self.average_headroom = 1.0
+        self.worst_headroom = 1.0
+        self.start()
+
+    def set_fps(self, fps):
+        """ Changes the target frame rate. A falsy fps runs uncapped. """
+
+        self.fps = fps
+        self.period = 1.0/fps if fps else 0
+
+    def start(self):
+        """ Starts timing from now, as after a pause or a scene change. """
+
+        self.then = time.perf_counter()
+        self.deadline = self.then + self.period
+
+    def wait(self):
+        """ Waits until the next frame is due and returns the seconds since
+        the previous one. """
+
+        now = time.perf_counter()
+        work = now - self.then
+        if self.period:
+            self.headroom = 1 - work / self.period
+            self.average_headroom += (self.headroom - self.average_headroom) * 0.05
+            self.worst_headroom = min(self.worst_headroom, self.headroom)
+
+        if self.period and not self.vsync:
+            remaining = self.deadline - now
+            if remaining > self.spin:
+                time.sleep(remaining - self.spin)
+                woke = time.perf_counter()
+                self.slept += woke - now
+
+                #   Spin for about as long as sleeps have been overshooting
+                overshoot = woke - (self.deadline - self.spin)
+                self.spin += (min(self.max_spin, max(self.min_spin, overshoot * 1.5)) - self.spin) * 0.1
+                now = woke
+            spin_start = now
+            while now < self.deadline:
+                now = time.perf_counter()
+            self.spun += now - spin_start
+
+            #   A frame that ran long resets the schedule instead of being
+            #   made up for with a burst of short ones
+            if now - self.deadline > self.period:
+                self.late += 1
+                self.deadline = now
+            self.deadline += self.period
+
+        dt = now - self.then
+        self.then = now
+        self.frames += 1
+        return dt
+
+    def stats(self):
+        frames = max(self.frames, 1)
+        return {"fps": self.fps,
+                "headroom": self.average_headroom,
+                "worst_headroom": self.worst_headroom,
+                "late": self.late,
+                "sleep_ms": self.slept * 1000 / frames,
+                "spin_ms": self.spun * 1000 / frames}
@@ -1,11 +1,25 @@
 import random
 import pygame
 import math
+import numpy as np
 from helpers import normalize, random_angle_vec, list_addition
+from assets import images, scales
+from pool import pools
+from render import DECALS, PARTICLES
 
 class Particle(object):
 
+    #   Simulated particles are handed to the ParticleSystem's arrays; the
+    #   others keep running their own update and draw methods
+    simulated = True
+
+    #   Seconds before a particle is stamped into the decal layer for good
+    lifetime = 8
+
     def __init__(self, game, pos):
+        self.reset(game, pos)
+
+    def reset(self, game, pos):
 
         self.game = game
         self.x, self.y = pos
@@ -38,24 +52,34 @@ class Particle(object):
         scale = camera.scale
         size_original = 20
         width = int(size_original * scale)
-        scaled = pygame.transform.scale(self.sprite, (width, width))
+        scaled = scales.scale(self.sprite, (width, width))
         x = int((self.x - camera.x) * scale * self.game.c.TILE_SIZE - width / 2 + self.game.c.WINDOW_WIDTH // 2)
         y = int((self.y - camera.y) * scale * self.game.c.TILE_SIZE - width / 2 + self.game.c.WINDOW_HEIGHT // 2)
-        self.game.screen.blit(scaled, (x, y))
+        self.game.renderer.submit(scaled, (x, y), PARTICLES)
 
     def check_arena_bounds(self):
-        if not self.game.c.in_arena_bounds([self.x, self.y]):
-            direction = [self.x, self.y]
-            normalize(direction, -1)
-            self.push(*direction)
+        if not self.game.arena.inside(self.x, self.y):
+            self.push(*self.game.arena.push(self.x, self.y))
 
     def push(self, x, y):
         self.velocity[0] += x
         self.velocity[1] += y
 
+#   Spinning particles are turned to one of this many angles, each of which
+#   is rotated once and shared
+ROTATIONS = 24
+
+
+def rotated_sprite(path):
+    """ Returns the image at path turned to a random one of the fixed angles. """
+    angle = int(random.random() * ROTATIONS) * 360 // ROTATIONS
+    return images.derived("%s rotated %s" % (path, angle),
+                          lambda: images.pack(pygame.transform.rotate(images.load(path), angle)))
+
+
 class Feather(Particle):
 
-    def __init__(self, game, pos):
+    def reset(self, game, pos):
 
         self.game = game
         self.x, self.y = pos
@@ -63,8 +87,7 @@ class Feather(Particle):
         self.deccel = 0.1
 
         path = random.choice(["feather_1.png", "feather_2.png", "feather_3.png"])
-        self.sprite = pygame.image.load(path)
-        self.sprite = pygame.transform.rotate(self.sprite, int(random.random() * 360))
+        self.sprite = rotated_sprite(path)
 
         self.speed = random.random() * self.max_speed
         self.velocity = random_angle_vec()
@@ -75,7 +98,7 @@ class Feather(Particle):
 
 class PlayerBit(Feather):
 
-    def __init__(self, game, pos):
+    def reset(self, game, pos):
 
         self.game = game
         self.x, self.y = pos
@@ -83,8 +106,7 @@ class PlayerBit(Feather):
         self.deccel = 0.1
 
         path = random.choice(["player_bit_1.png", "player_bit_2.png", "player_bit_3.png"])
-        self.sprite = pygame.image.load(path)
-        self.sprite = pygame.transform.rotate(self.sprite, int(random.random() * 360))
+        self.sprite = rotated_sprite(path)
 
         self.speed = random.random() * self.max_speed
         self.velocity = random_angle_vec()
@@ -95,7 +117,7 @@ class PlayerBit(Feather):
 
 class Confettus(Feather):
 
-    def __init__(self, game, pos):
+    def reset(self, game, pos):
 
         self.game = game
         self.x, self.y = pos
@@ -103,8 +125,7 @@ class Confettus(Feather):
         self.deccel = 0.1
 
         path = random.choice([("confettus_%s.png" % str(i+1)) for i in range(10)])
-        self.sprite = pygame.image.load(path)
-        self.sprite = pygame.transform.rotate(self.sprite, int(random.random() * 360))
+        self.sprite = rotated_sprite(path)
 
         self.speed = random.random() * self.max_speed
         self.velocity = random_angle_vec()
@@ -115,14 +136,16 @@ class Confettus(Feather):
 
 class YouWin(Particle):
 
-    def __init__(self, game, pos):
+    simulated = False
+
+    def reset(self, game, pos):
 
         self.game = game
         self.x, self.y = pos
         self.max_speed = 12
         self.deccel = 0.04
 
-        self.sprite = pygame.image.load("you_win_balloon.png")
+        self.sprite = images.load("you_win_balloon.png")
 
         self.speed = self.max_speed
         self.velocity = [0, -self.max_speed]
@@ -139,11 +162,171 @@ class YouWin(Particle):
         scale = camera.scale
         width = int(self.w * scale)
         height = int(self.h * scale)
-        scaled = pygame.transform.scale(self.sprite, (width, height))
+        scaled = scales.scale(self.sprite, (width, height))
         x = int((self.x - camera.x) * scale * self.game.c.TILE_SIZE - width / 2 + self.game.c.WINDOW_WIDTH // 2)
         y = int((self.y - camera.y + self.offset) * scale * self.game.c.TILE_SIZE - height / 2 + self.game.c.WINDOW_HEIGHT // 2)
-        self.game.screen.blit(scaled, (x, y))
+        self.game.renderer.submit(scaled, (x, y), PARTICLES)
 
     def update(self, dt):
         super().update(dt)
-        self.offset = math.sin(self.since_spawn * 4) * 0.25
\ No newline at end of file
+        self.offset = math.sin(self.since_spawn * 4) * 0.25
+
+
+class ParticleSystem(object):
+    """ Owns every particle in the arena. Moving particles are integrated in
+    numpy arrays. Once a particle stops moving, or outlives its lifetime, it is
+    baked into a world-space decal layer and no longer costs anything per
+    frame. At capacity, the oldest particle is baked early to make room. """
+
+    def __init__(self, game, capacity=400, settle_speed=0.05):
+        self.game = game
+        self.capacity = capacity
+        self.settle_speed = settle_speed
+        self.size_original = 20
+
+        self.count = 0
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.deccel = np.zeros(capacity)
+        self.age = np.zeros(capacity)
+        self.lifetime = np.zeros(capacity)
+        self.sprites = []
+
+        #   Particles that update and draw themselves, like the you win balloon
+        self.actors = set()
+
+        #   Decal layer covering the arena and the stands, in world pixels
+        c = self.game.c
+        self.decal_origin = (-c.MAJOR_RADIUS - 4, -c.MINOR_RADIUS - 6)
+        width = (2 * c.MAJOR_RADIUS + 8) * c.TILE_SIZE
+        height = (2 * c.MINOR_RADIUS + 10) * c.TILE_SIZE
+        self.decals = pygame.Surface((width, height), pygame.SRCALPHA)
+        self.decal_bounds = None
+        self.decal_version = 0
+        self.scaled_decals = None
+        self.scaled_decals_key = None
+        self.baked = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return self.count + len(self.actors)
+
+    def add(self, particle):
+        self.game.spawned(particle)
+        if not particle.simulated:
+            self.actors.add(particle)
+            return
+        if self.count == self.capacity:
+            self.evicted += 1
+            self.bake(int(np.argmax(self.age[:self.count])))
+
+        slot = self.count
+        self.x[slot], self.y[slot] = particle.x, particle.y
+        self.vx[slot], self.vy[slot] = particle.velocity
+        self.speed[slot] = particle.speed
+        self.deccel[slot] = particle.deccel
+        self.age[slot] = particle.since_spawn
+        self.lifetime[slot] = particle.lifetime
+        self.sprites.append(particle.sprite)
+        self.count += 1
+
+        #   The arrays now hold all the particle object carried
+        pools.release(particle)
+
+    def remove(self, slot):
+        """ Drops the particle in slot, moving the last one into its place. """
+
+        last = self.count - 1
+        if slot != last:
+            for array in (self.x, self.y, self.vx, self.vy, self.speed, self.deccel, self.age, self.lifetime):
+                array[slot] = array[last]
+            self.sprites[slot] = self.sprites[last]
+        self.sprites.pop()
+        self.count -= 1
+
+    def bake(self, slot):
+        """ Stamps the particle in slot into the decal layer and removes it. """
+
+        tile = self.game.c.TILE_SIZE
+        width = self.size_original
+        sprite = scales.scale(self.sprites[slot], (width, width))
+        x = int((self.x[slot] - self.decal_origin[0]) * tile - width/2)
+        y = int((self.y[slot] - self.decal_origin[1]) * tile - width/2)
+        rect = self.decals.blit(sprite, (x, y))
+        self.decal_bounds = rect if self.decal_bounds is None else self.decal_bounds.union(rect)
+        self.decal_version += 1
+        self.baked += 1
+        self.remove(slot)
+
+    def update(self, dt):
+        for actor in self.actors:
+            actor.update(dt)
+
+        n = self.count
+        if not n:
+            return
+        x, y, vx, vy, speed = self.x[:n], self.y[:n], self.vx[:n], self.vy[:n], self.speed[:n]
+        self.age[:n] += dt
+
+        speed *= self.deccel[:n]**dt
+        r = np.hypot(vx, vy)
+        moving = r > 0
+        factor = np.divide(speed, r, out=np.zeros(n), where=moving)
+        vx[:] = np.where(moving, vx * factor, speed)
+        vy[:] = np.where(moving, vy * factor, 0)
+
+        #   Push particles that strayed out of the arena back toward the middle
+        outside = ~self.game.arena.inside_batch(x, y)
+        if outside.any():
+            push_x, push_y = self.game.arena.push_batch(x[outside], y[outside])
+            vx[outside] += push_x
+            vy[outside] += push_y
+
+        x += vx * dt
+        y += vy * dt
+
+        done = (speed < self.settle_speed) | (self.age[:n] > self.lifetime[:n])
+        for slot in np.flatnonzero(done)[::-1]:
+            self.bake(int(slot))
+
+    def draw_decals(self):
+        if self.decal_bounds is None:
+            return
+        camera = self.game.camera
+        scale = camera.scale
+        ppt = scale * self.game.c.TILE_SIZE
+        x = int((self.decal_origin[0] - camera.x) * ppt + self.game.c.WINDOW_WIDTH//2)
+        y = int((self.decal_origin[1] - camera.y) * ppt + self.game.c.WINDOW_HEIGHT//2)
+
+        bounds = self.decal_bounds
+        if abs(scale - 1.0) < 0.001:
+            self.game.renderer.submit(self.decals, (x + bounds.x, y + bounds.y), DECALS, bounds)
+            return
+
+        #   The layer changes as particles bake, so keep our own scaled copy
+        size = (int(self.decals.get_width() * scale), int(self.decals.get_height() * scale))
+        key = (self.decal_version, size)
+        if key != self.scaled_decals_key:
+            self.scaled_decals = pygame.transform.scale(self.decals, size)
+            self.scaled_decals_key = key
+        self.game.renderer.submit(self.scaled_decals, (x, y), DECALS)
+
+    def draw(self):
+        self.draw_decals()
+
+        n = self.count
+        if n:
+            camera = self.game.camera
+            scale = camera.scale
+            width = int(self.size_original * scale)
+            ppt = scale * self.game.c.TILE_SIZE
+            xs = ((self.x[:n] - camera.x) * ppt - width/2 + self.game.c.WINDOW_WIDTH//2).astype(int)
+            ys = ((self.y[:n] - camera.y) * ppt - width/2 + self.game.c.WINDOW_HEIGHT//2).astype(int)
+            scaled = [scales.scale(sprite, (width, width)) for sprite in self.sprites]
+            self.game.renderer.submit_array(scaled, xs, ys, (width, width), PARTICLES)
+
+        for actor in self.actors:
+            actor.draw()
@@ -0,0 +1,78 @@
+import math
+import numpy as np
+
+
+class Pattern(object):
+    """ A bullet pattern compiled to a table of velocities, one row per shot
+    and one column per bullet, from a (shots, count) array of angles, or a
+    single row of them for a pattern that repeats every shot. Directions
+    follow helpers.angle_vec, where an angle of 0 points down the screen.
+    Firing a shot rotates its row by the given angle and adds the whole row
+    to the bullet pool in one batch. """
+
+    def __init__(self, angles, speed):
+        self.speed = speed
+        angles = np.atleast_2d(angles)
+        self.shots, self.count = angles.shape
+        self.vx = np.sin(angles) * speed
+        self.vy = np.cos(angles) * speed
+
+    def velocities(self, shot=0, angle=0):
+        vx = self.vx[shot % self.shots]
+        vy = self.vy[shot % self.shots]
+        if angle:
+            c, s = math.cos(angle), math.sin(angle)
+            vx, vy = vx * c + vy * s, vy * c - vx * s
+        return vx, vy
+
+    def emit(self, game, pos, shot=0, angle=0, **batch):
+        """ Fires shot number shot from pos, turned by angle radians. Keyword
+        arguments, like friendly or bullet_type, go to BulletPool.add_batch.
+        Returns the number of bullets fired. """
+
+        vx, vy = self.velocities(shot, angle)
+        game.bullets.add_batch(pos[0], pos[1], vx, vy, **batch)
+        return self.count
+
+
+class Ring(Pattern):
+    """ count bullets evenly spaced around a circle. """
+
+    def __init__(self, count, speed, offset=0):
+        super().__init__(np.arange(count) / count * 2 * math.pi + offset, speed)
+
+
+class Spiral(Pattern):
+    """ A ring of count bullets that turns by turn radians on every shot,
+    repeating after shots shots, or once it has come full circle. """
+
+    def __init__(self, count, speed, turn, shots=None):
+        if shots is None:
+            shots = max(1, int(round(2 * math.pi / abs(turn))))
+        ring = np.arange(count) / count * 2 * math.pi
+        super().__init__(ring[None, :] + np.arange(shots)[:, None] * turn, speed)
+
+
+class Sweep(Pattern):
+    """ arms evenly spaced streams that swing by step radians a shot, turning
+    back after turn_at shots, for shots shots in total. """
+
+    def __init__(self, arms, speed, step, shots, turn_at=None):
+        if turn_at is None:
+            turn_at = shots // 2
+        shot = np.arange(shots)
+        swing = np.where(shot <= turn_at, shot, 2 * turn_at - shot) * step
+        super().__init__(swing[:, None] + np.arange(arms)[None, :] / arms * 2 * math.pi, speed)
+
+
+class AimedBurst(Pattern):
+    """ count bullets fanned across spread radians, centred on the angle they
+    are fired at. Use aim() to get the angle towards a target. """
+
+    def __init__(self, count, speed, spread=0):
+        super().__init__(np.linspace(-spread/2, spread/2, count) if count > 1 else np.zeros(1), speed)
+
+
+def aim(pos, target):
+    """ Angle, in the angle_vec convention, pointing from pos to target. """
+    return math.atan2(target[0] - pos[0], target[1] - pos[1])
@@ -1,9 +1,12 @@
 import pygame
 import math
 from helpers import normalize, list_subtraction, magnitude, dist_between
-from sprite_tools import SpriteSheet, Sprite
+from sprite_tools import Sprite, sheets
 from splash import Splash, BulletSpawn
 from particle import Feather, PlayerBit
+from assets import images, sounds, scales
+from pool import pools
+from render import PLAYER
 
 
 class Player(object):
@@ -24,19 +27,14 @@ class Player(object):
         self.x = 0
         self.y = 0
 
-        self.pick_up_ammo_sound = pygame.mixer.Sound("pick_up_ammo.wav")
-        self.pick_up_ammo_sound.set_volume(0.15)
+        self.pick_up_ammo_sound = sounds.sound("pick_up_ammo.wav", volume=0.15, max_voices=3)
         self.sound_queue = []
         self.sound_lookup = {"pick_up_ammo": self.pick_up_ammo_sound}
         self.since_last_pop = 100
-        self.dodge_sound = pygame.mixer.Sound("dash.wav")
-        self.dodge_sound.set_volume(0.03)
-        self.get_hit_sound = pygame.mixer.Sound("get_hit.wav")
-        self.get_hit_sound.set_volume(0.15)
-        self.fire_sound = pygame.mixer.Sound("fire.wav")
-        self.fire_sound.set_volume(0.5)
-        self.death_sound = pygame.mixer.Sound("death.wav")
-        self.death_sound.set_volume(0.3)
+        self.dodge_sound = sounds.sound("dash.wav", volume=0.03, max_voices=1)
+        self.get_hit_sound = sounds.sound("get_hit.wav", volume=0.15, max_voices=2)
+        self.fire_sound = sounds.sound("fire.wav", volume=0.5, max_voices=2)
+        self.death_sound = sounds.sound("death.wav", volume=0.3, max_voices=1)
 
         self.dodging = False
         self.dodge_sprite = pygame.Surface((32, 32))
@@ -57,18 +55,14 @@ class Player(object):
 
         self.sprite = Sprite(fps=18)
         self.sprite_size = (48, 48)
-        self.idle_right = SpriteSheet("player_facing_right.png", (4, 1), 4)
-        self.idle_left = SpriteSheet("player_facing_right.png", (4, 1), 4)
-        self.idle_left.reverse(1, 0)
-        self.dodge_right = SpriteSheet("player_dodging_right.png", (8, 1), 8)
-        self.dodge_left = SpriteSheet("player_dodging_right.png", (8, 1), 8)
-        self.dodge_left.reverse(1, 0)
-        self.run_right = SpriteSheet("player_running_right.png", (4, 1), 4)
-        self.run_left = SpriteSheet("player_running_right.png", (4, 1), 4)
-        self.run_left.reverse(1, 0)
-        self.take_damage_right = SpriteSheet("player_damaged.png", (1, 1), 1)
-        self.take_damage_left = SpriteSheet("player_damaged.png", (1, 1), 1)
-        self.take_damage_left.reverse(1, 0)
+        self.idle_right = sheets.get("player_facing_right.png", (4, 1), 4)
+        self.idle_left = sheets.get("player_facing_right.png", (4, 1), 4, reverse_x=True)
+        self.dodge_right = sheets.get("player_dodging_right.png", (8, 1), 8)
+        self.dodge_left = sheets.get("player_dodging_right.png", (8, 1), 8, reverse_x=True)
+        self.run_right = sheets.get("player_running_right.png", (4, 1), 4)
+        self.run_left = sheets.get("player_running_right.png", (4, 1), 4, reverse_x=True)
+        self.take_damage_right = sheets.get("player_damaged.png", (1, 1), 1)
+        self.take_damage_left = sheets.get("player_damaged.png", (1, 1), 1, reverse_x=True)
         self.sprite.add_animation({"IdleRight": self.idle_right,
                                    "IdleLeft": self.idle_left,
                                    "DodgingRight": self.dodge_right,
@@ -78,8 +72,8 @@ class Player(object):
                                    "DamageRight": self.take_damage_right,
                                    "DamageLeft": self.take_damage_left})
         self.sprite.start_animation("IdleRight")
-        self.ammo_sprite = pygame.image.load("ammo.png")
-        self.ammo_full_sprite = pygame.image.load("ammo_full.png")
+        self.ammo_sprite = images.load("ammo.png")
+        self.ammo_full_sprite = images.load("ammo_full.png")
 
         self.bullets_collected = []
         self.pocket_size = 6
@@ -93,16 +87,14 @@ class Player(object):
 
         self.hp = 3
         self.max_hp = 3
-        self.full_heart = pygame.image.load("full_heart.png")
-        self.empty_heart = pygame.image.load("empty_heart.png")
+        self.full_heart = images.load("full_heart.png")
+        self.empty_heart = images.load("empty_heart.png")
 
-        self.shadow = pygame.image.load("shadow.png").convert()
-        self.shadow.set_alpha(80)
-        self.shadow.set_colorkey((255, 0, 0))
+        self.shadow = images.load("shadow.png", convert=True, colorkey=(255, 0, 0), alpha=80)
 
         self.dead = False
 
-        self.hit_by_bullet_sound = pygame.mixer.Sound("hit.wav")
+        self.hit_by_bullet_sound = sounds.sound("hit.wav")
 
     def update_sound_queue(self, dt):
         self.since_last_pop += dt
@@ -115,7 +107,7 @@ class Player(object):
         self.game.fight_music.set_volume(0.1)
         for i in range(25):
             self.dead = True
-            PlayerBit(self.game, [self.x, self.y])
+            pools.acquire(PlayerBit, self.game, [self.x, self.y])
 
     def update(self, dt):
         if self.hp <= 0 and not self.dead:
@@ -191,30 +183,29 @@ class Player(object):
         camera = self.game.camera
         scale = camera.scale
         width = int(self.sprite_size[0] * scale)
-        x = int((self.x - camera.x) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_WIDTH//2)
-        y = int((self.y - camera.y) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_HEIGHT//2)
+        draw_x, draw_y = self.game.render_pos(self)
+        x = int((draw_x - camera.x) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_WIDTH//2)
+        y = int((draw_y - camera.y) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_HEIGHT//2)
         img = self.sprite.get_good_frame()
         sprite = img#self.sprite if not self.dodging else self.dodge_sprite
-        scaled = pygame.transform.scale(sprite, (width, width))
+        scaled = scales.scale(sprite, (width, width))
 
         soffset = 37
-        shadow = pygame.transform.scale(self.shadow, (int(self.shadow.get_width() * scale), int(self.shadow.get_height() * scale)))
-        self.game.screen.blit(shadow, (int(x + 5*scale), int(y + soffset*scale)))
-
-        self.game.screen.blit(scaled, (x, y))
+        shadow = scales.scale(self.shadow, (int(self.shadow.get_width() * scale), int(self.shadow.get_height() * scale)))
+        blits = [(shadow, (int(x + 5*scale), int(y + soffset*scale))), (scaled, (x, y))]
 
         if len(self.bullets_collected) < self.pocket_size:
-            scaled_ammo = pygame.transform.scale(self.ammo_sprite, (int(self.ammo_sprite.get_width() * scale), int(self.ammo_sprite.get_height() * scale)))
+            scaled_ammo = scales.scale(self.ammo_sprite, (int(self.ammo_sprite.get_width() * scale), int(self.ammo_sprite.get_height() * scale)))
         else:
-            scaled_ammo = pygame.transform.scale(self.ammo_full_sprite, (int(self.ammo_sprite.get_width() * scale), int(self.ammo_sprite.get_height() * scale)))
+            scaled_ammo = scales.scale(self.ammo_full_sprite, (int(self.ammo_sprite.get_width() * scale), int(self.ammo_sprite.get_height() * scale)))
         ammo_x = x - (self.game.c.TILE_SIZE*scale)//6
         ammo_y = y + (self.game.c.TILE_SIZE*scale)
         for item in self.bullets_collected:
-            self.game.screen.blit(scaled_ammo, (ammo_x, ammo_y))
+            blits.append((scaled_ammo, (ammo_x, ammo_y)))
             ammo_y -= int(5 * scale)
 
-        scaled_full_heart = pygame.transform.scale(self.full_heart, (int(self.full_heart.get_width() * scale), int(self.full_heart.get_height() * scale)))
-        scaled_empty_heart = pygame.transform.scale(self.empty_heart, (int(self.empty_heart.get_width() * scale), int(self.empty_heart.get_height() * scale)))
+        scaled_full_heart = scales.scale(self.full_heart, (int(self.full_heart.get_width() * scale), int(self.full_heart.get_height() * scale)))
+        scaled_empty_heart = scales.scale(self.empty_heart, (int(self.empty_heart.get_width() * scale), int(self.empty_heart.get_height() * scale)))
         spacing = 2
         heart_x = x + int((self.game.c.TILE_SIZE*scale)*0.19)
         heart_y = y - (self.game.c.TILE_SIZE*scale)//2
@@ -223,8 +214,9 @@ class Player(object):
                 heart_to_draw = scaled_full_heart
             else:
                 heart_to_draw = scaled_empty_heart
-            self.game.screen.blit(heart_to_draw, (int(heart_x), int(heart_y)))
+            blits.append((heart_to_draw, (int(heart_x), int(heart_y))))
             heart_x += (self.full_heart.get_width() + spacing) * scale
+        self.game.renderer.submit_many(blits, PLAYER)
 
 
 
@@ -241,15 +233,14 @@ class Player(object):
         return self.since_stun_start < 0
 
     def check_arena_bounds(self):
-        if not self.game.c.in_arena_bounds([self.x, self.y]):
-            direction = [self.x, self.y]
-            normalize(direction, -3)
-            self.push(*direction)
+        if not self.game.arena.inside(self.x, self.y):
+            push_x, push_y = self.game.arena.push(self.x, self.y)
+            self.push(push_x * 3, push_y * 3)
             self.stun(time=0.1)
 
     def check_events(self, dt):
-        keys = pygame.key.get_pressed()
-        mbuttons = pygame.mouse.get_pressed()
+        keys = self.game.get_keys()
+        mbuttons = self.game.get_mouse_buttons()
 
         if not self.dodging and not self.stunned() and not self.dead:
             if keys[self.up_key]:
@@ -298,13 +289,7 @@ class Player(object):
 
 
     def colliding_enemy_bullets(self):
-        ceb = set()
-        for bullet in self.game.bullets:
-            if not bullet.friendly:
-                dist = (bullet.x - self.x)**2 + (bullet.y - self.y)**2
-                if dist < (self.hit_radius + bullet.hit_radius)**2:
-                    ceb.add(bullet)
-        return ceb
+        return self.game.bullets.colliding(self.x, self.y, self.hit_radius, friendly=False)
 
     def check_bullet_collisions(self):
         ceb = self.colliding_enemy_bullets()
@@ -315,15 +300,16 @@ class Player(object):
                     self.bullets_collected.append(item)
                     self.sound_queue.append(self.pick_up_ammo_sound)
                     item.friendly = True
-                    BulletSpawn(self.game, [item.x, item.y])
+                    pools.acquire(BulletSpawn, self.game, [item.x, item.y])
                 else:
                     pass_through.add(item)
+            self.game.bullets -= (ceb - pass_through)
 
         else:
             for item in ceb:
                 self.get_hit_by(item)
-
-        self.game.bullets -= (ceb - pass_through)
+            self.game.bullets -= ceb
+            pools.release_all(ceb)
 
     def check_enemy_collisions(self):
         for enemy in self.game.enemies:
@@ -339,7 +325,7 @@ class Player(object):
             self.push(*direction)
             self.blinking = True
             self.since_blink_start = 0
-            Splash(self.game, [self.x, self.y])
+            pools.acquire(Splash, self.game, [self.x, self.y])
             self.stun()
 
             self.hp -= 1
@@ -352,7 +338,7 @@ class Player(object):
         self.blinking = True
         self.hp -= 1
         self.since_blink_start = 0
-        Splash(self.game, [bullet.x, bullet.y])
+        pools.acquire(Splash, self.game, [bullet.x, bullet.y])
 
         impact_amt = bullet.velocity[:]
         normalize(impact_amt, bullet.knockback)
@@ -371,7 +357,6 @@ class Player(object):
             new_bullet.x = self.x
             new_bullet.y = self.y - 0.25
             self.game.bullets.add(new_bullet)
-            new_bullet.get_caught()
             self.since_last_bullet = 0
-            BulletSpawn(self.game, [new_bullet.x, new_bullet.y])
+            pools.acquire(BulletSpawn, self.game, [new_bullet.x, new_bullet.y])
             self.game.camera.shake(0.1)
\ No newline at end of file
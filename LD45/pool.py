@@ -0,0 +1,46 @@
+class ObjectPool(object):
+    """ Free lists of short-lived game objects, one per class. acquire() hands
+    back a released object put through its reset() method, with the same
+    arguments the constructor takes, and only builds a new one when the free
+    list is empty. Released objects must no longer be referenced by the game. """
+
+    def __init__(self, max_free=512):
+        self.max_free = max_free
+        self.free = {}
+        self.created = {}
+        self.reused = {}
+
+    def acquire(self, cls, *args):
+        free = self.free.get(cls)
+        if free:
+            thing = free.pop()
+            thing.reset(*args)
+            self.reused[cls] = self.reused.get(cls, 0) + 1
+            return thing
+        self.created[cls] = self.created.get(cls, 0) + 1
+        return cls(*args)
+
+    def release(self, thing):
+        cls = type(thing)
+        free = self.free.setdefault(cls, [])
+        if len(free) < self.max_free:
+            free.append(thing)
+
+    def release_all(self, things):
+        for thing in things:
+            self.release(thing)
+
+    def clear(self):
+        self.free = {}
+
+    def stats(self):
+        """ Per class: objects built, acquisitions served from the free list,
+        and objects waiting in it now. """
+
+        return {cls.__name__: {"created": self.created.get(cls, 0),
+                               "reused": self.reused.get(cls, 0),
+                               "free": len(self.free.get(cls, ()))}
+                for cls in set(self.created) | set(self.free)}
+
+
+pools = ObjectPool()
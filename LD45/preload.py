@@ -0,0 +1,119 @@
+import os
+import glob
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+
+class LoadRecord(object):
+    """ How long one file took to decode, and on which worker. """
+
+    def __init__(self, path, kind, start, seconds, size, worker):
+        self.path = path
+        self.kind = kind
+        self.start = start
+        self.seconds = seconds
+        self.size = size
+        self.worker = worker
+
+
+class AssetPreloader(object):
+    """ Decodes image and sound files on a pool of worker threads. Each file
+    is handed to the image cache or sound bank as a pending future, so the
+    first call that needs it waits for that one file instead of decoding it
+    a second time. Surfaces are only decoded on the workers; conversion to
+    the display format still happens on the main thread, when asked for. """
+
+    def __init__(self, images, sounds, workers=None):
+        self.images = images
+        self.sounds = sounds
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.executor = None
+        self.futures = []
+        self.records = []
+        self.started = None
+
+        #   Seconds the game spent blocked in wait()
+        self.waited = 0
+
+    def manifest(self):
+        """ Every image and sound file the game can load, largest first so
+        that the long decodes start early. """
+
+        paths = glob.glob("*.png") + glob.glob("*.wav")
+        return sorted(paths, key=os.path.getsize, reverse=True)
+
+    def start(self, paths=None):
+        if paths is None:
+            paths = self.manifest()
+        self.started = time.perf_counter()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="preload")
+        for path in paths:
+            if path.endswith(".wav"):
+                if not pygame.mixer.get_init():
+                    continue
+                cache, load, kind = self.sounds, pygame.mixer.Sound, "sound"
+            else:
+                cache, load, kind = self.images, pygame.image.load, "image"
+            if path in cache.raw or path in cache.pending or (cache.archive and path in cache.archive):
+                continue
+            future = self.executor.submit(self.decode, path, load, kind)
+            cache.pending[path] = future
+            self.futures.append(future)
+
+    def decode(self, path, load, kind):
+        start = time.perf_counter()
+        result = load(path)
+        self.records.append(LoadRecord(path, kind, start, time.perf_counter() - start, os.path.getsize(path),
+                                       threading.current_thread().name))
+        return result
+
+    def done(self):
+        return all(future.done() for future in self.futures)
+
+    def progress(self):
+        """ Fraction of the queued files that have been decoded. """
+
+        if not self.futures:
+            return 1.0
+        return sum(1 for future in self.futures if future.done()) / len(self.futures)
+
+    def wait(self):
+        """ Blocks until every queued file is decoded and moves them all into
+        the caches. Returns the seconds spent waiting. """
+
+        start = time.perf_counter()
+        for cache in (self.images, self.sounds):
+            for path in list(cache.pending):
+                cache.decode(path)
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
+        waited = time.perf_counter() - start
+        self.waited += waited
+        return waited
+
+    def report(self):
+        """ Lines describing how long each file took to decode, or to be
+        served from the asset archive, slowest first, then when the last file
+        finished and how long the game had to wait for it. """
+
+        archive = self.images.archive or self.sounds.archive
+        served = archive.loads if archive else []
+        lines = []
+        for record in sorted(self.records + served, key=lambda record: record.seconds, reverse=True):
+            lines.append("  %-28s %-5s %8.2f ms %8.1f KB  %s" % (record.path, record.kind, record.seconds * 1000,
+                                                                 record.size / 1024.0, record.worker))
+        if archive:
+            lines.append("%s opened in %.2f ms with %s entries, %s served in %.1f ms" %
+                         (archive.path, archive.open_seconds * 1000, archive.entries(), len(served),
+                          sum(record.seconds for record in served) * 1000))
+        if self.records:
+            decoding = sum(record.seconds for record in self.records)
+            finished = max(record.start + record.seconds for record in self.records)
+            lines.append("%s files, %.1f ms of decoding done %.1f ms after start on %s workers, %.1f ms waited" %
+                         (len(self.records), decoding * 1000, (finished - self.started) * 1000, self.workers,
+                          self.waited * 1000))
+        return lines
@@ -0,0 +1,180 @@
+import time
+from collections import OrderedDict, deque
+
+import pygame
+
+
+class NullScope(object):
+    """ Scope handed out while profiling is off. Entering and leaving it does
+    nothing, so an instrumented stage costs one method call. """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+NULL_SCOPE = NullScope()
+
+
+class Scope(object):
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.record(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+class FrameProfiler(object):
+    """ Times named stages of each frame and keeps the last few seconds of
+    them. A stage that runs several times in one frame, like an update during
+    a frame with two simulation steps, adds up. Off by default; while off,
+    scope() returns a shared no-op. The overlay and an attached telemetry
+    writer each keep it on. """
+
+    COLORS = [(230, 80, 70), (240, 160, 50), (230, 220, 70), (120, 210, 80), (60, 190, 170),
+              (70, 140, 230), (140, 100, 230), (220, 100, 200), (170, 170, 170), (255, 255, 255)]
+
+    def __init__(self, history=120, budget=1/60.0):
+        self.enabled = False
+        self.overlay = False
+        self.telemetry = None
+        self.spans = []
+        self.history = history
+        self.budget = budget
+        self.frames = deque(maxlen=history)
+        self.stages = OrderedDict()
+        self.current = {}
+        self.counts = {}
+        self.frame_start = None
+        self.scopes = {}
+        self.font = None
+        self.backing = None
+        self.legend = []
+        self.legend_age = 0
+
+    def set_history(self, frames):
+        self.history = frames
+        self.frames = deque(self.frames, maxlen=frames)
+
+    def toggle(self):
+        """ Shows or hides the overlay. """
+
+        self.overlay = not self.overlay
+        self.frames.clear()
+        self.set_enabled(self.overlay or self.telemetry is not None)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.current = {}
+        self.spans = []
+        self.frame_start = None
+
+    def attach(self, telemetry):
+        """ Sends every frame's stage spans to a TelemetryWriter. """
+
+        self.telemetry = telemetry
+        self.set_enabled(True)
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        if name not in self.scopes:
+            self.scopes[name] = Scope(self, name)
+        return self.scopes[name]
+
+    def record(self, name, start, seconds):
+        if name not in self.stages:
+            self.stages[name] = self.COLORS[len(self.stages) % len(self.COLORS)]
+        self.current[name] = self.current.get(name, 0) + seconds
+        if self.telemetry is not None:
+            self.spans.append((name, start, seconds))
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self, counts=None):
+        """ Closes the frame's timings. counts is a dict of entity counts to
+        show alongside them. """
+
+        if not self.enabled or self.frame_start is None:
+            return
+        total = time.perf_counter() - self.frame_start
+        self.current["total"] = total
+        self.frames.append(self.current)
+        self.current = {}
+        if counts is not None:
+            self.counts = counts
+        if self.telemetry is not None:
+            self.telemetry.frame(self.frame_start, total, self.spans, counts)
+            self.spans = []
+
+    def averages(self):
+        """ Mean and worst milliseconds per stage over the kept frames. """
+
+        result = OrderedDict()
+        if not self.frames:
+            return result
+        for name in list(self.stages) + ["total"]:
+            times = [frame.get(name, 0) * 1000 for frame in self.frames]
+            result[name] = (sum(times)/len(times), max(times))
+        return result
+
+    def draw(self, screen):
+        """ Draws the overlay: one stacked bar per kept frame with a line at
+        the frame budget, then per-stage timings and entity counts. """
+
+        if not self.overlay:
+            return
+        if self.font is None:
+            self.font = pygame.font.Font(None, 18)
+
+        bar_width = 3
+        graph_height = 120
+        ms_per_pixel = self.budget * 2000.0 / graph_height
+        left = 10
+        bottom = 10 + graph_height
+        if self.backing is None or self.backing.get_width() != self.history * bar_width:
+            self.backing = pygame.Surface((self.history * bar_width, graph_height))
+            self.backing.set_alpha(150)
+        screen.blit(self.backing, (left, 10))
+
+        for i, frame in enumerate(self.frames):
+            y = bottom
+            for name, color in self.stages.items():
+                height = int(frame.get(name, 0) * 1000 / ms_per_pixel)
+                if height <= 0:
+                    continue
+                height = min(height, y - 10)
+                y -= height
+                pygame.draw.rect(screen, color, (left + i * bar_width, y, bar_width, height))
+        budget_y = bottom - int(self.budget * 1000 / ms_per_pixel)
+        pygame.draw.line(screen, (255, 255, 255), (left, budget_y), (left + self.history * bar_width, budget_y))
+
+        #   Text is rendered a few times a second, not every frame
+        self.legend_age -= 1
+        if self.legend_age <= 0:
+            self.legend_age = 15
+            self.legend = []
+            for name, (mean, worst) in self.averages().items():
+                color = self.stages.get(name, (255, 255, 255))
+                text = "%-10s %5.2f ms  max %5.2f" % (name, mean, worst)
+                self.legend.append(self.font.render(text, False, color, (0, 0, 0)))
+            counts = "  ".join("%s %s" % (name, count) for name, count in sorted(self.counts.items()))
+            if counts:
+                self.legend.append(self.font.render(counts, False, (255, 255, 255), (0, 0, 0)))
+
+        y = bottom + 4
+        for line in self.legend:
+            screen.blit(line, (left, y))
+            y += line.get_height()
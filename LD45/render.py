@@ -0,0 +1,97 @@
+import numpy as np
+
+
+#   Layers, drawn bottom to top
+BACKGROUND = 0
+DECALS = 1
+PARTICLES = 2
+ENEMIES = 3
+PLAYER = 4
+CROWD = 5
+BULLETS = 6
+SPLASHES = 7
+OVERLAY = 8
+LAYER_COUNT = 9
+
+
+class RenderQueue(object):
+    """ Collects everything drawn in a frame as (surface, position) blits,
+    one list per layer, and draws it all in one Surface.blits call when the
+    frame is flushed. Within a layer, blits keep the order they were
+    submitted in. Blits that would land entirely off the screen are dropped
+    on submission. """
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.width, self.height = screen.get_size()
+        self.layers = [[] for i in range(LAYER_COUNT)]
+
+        self.culled = 0
+        self.last = {"sprites": 0, "culled": 0, "draw_calls": 0}
+        self.frames = 0
+        self.totals = {"sprites": 0, "culled": 0, "draw_calls": 0}
+
+    def submit(self, surface, pos, layer, area=None):
+        """ Queues surface to be drawn with its top left at pos. area, if
+        given, is the part of surface to draw, as in Surface.blit. """
+
+        x, y = pos
+        if area is None:
+            w, h = surface.get_size()
+        else:
+            w, h = area[2], area[3]
+        if x >= self.width or y >= self.height or x + w <= 0 or y + h <= 0:
+            self.culled += 1
+            return
+        if area is None:
+            self.layers[layer].append((surface, pos))
+        else:
+            self.layers[layer].append((surface, pos, area))
+
+    def submit_many(self, blits, layer):
+        """ Queues a list of (surface, pos) pairs without culling them, for
+        callers that have already placed them on screen. """
+
+        self.layers[layer].extend(blits)
+
+    def submit_array(self, surfaces, xs, ys, size, layer):
+        """ Queues surfaces[i] at (xs[i], ys[i]) for arrays of positions, all
+        of the given (width, height). surfaces may be one surface for all of
+        them. """
+
+        n = len(xs)
+        if not n:
+            return
+        w, h = size
+        visible = (xs < self.width) & (ys < self.height) & (xs + w > 0) & (ys + h > 0)
+        shown = np.flatnonzero(visible)
+        self.culled += n - len(shown)
+        positions = zip(xs[shown].tolist(), ys[shown].tolist())
+        if isinstance(surfaces, (list, tuple)):
+            if len(shown) < n:
+                surfaces = [surfaces[i] for i in shown.tolist()]
+            self.layers[layer].extend(zip(surfaces, positions))
+        else:
+            self.layers[layer].extend((surfaces, pos) for pos in positions)
+
+    def flush(self):
+        """ Draws and clears everything queued, bottom layer first. """
+
+        blits = []
+        for layer in self.layers:
+            blits.extend(layer)
+            layer.clear()
+        if blits:
+            self.screen.blits(blits, doreturn=False)
+
+        self.last = {"sprites": len(blits), "culled": self.culled, "draw_calls": 1 if blits else 0}
+        self.frames += 1
+        for key, value in self.last.items():
+            self.totals[key] += value
+        self.culled = 0
+
+    def stats(self):
+        """ Average sprites drawn and culled per flushed frame. """
+
+        frames = max(self.frames, 1)
+        return {key: value / frames for key, value in self.totals.items()}
@@ -0,0 +1,162 @@
+import numpy as np
+
+
+class SpatialGrid(object):
+    """ Uniform grid over a rectangle of world space, used to find which
+    items are near a point without testing every item. The grid indexes
+    integer ids (array slots) rather than objects. It is rebuilt in bulk from
+    position arrays and can be patched in between rebuilds as ids are
+    inserted, removed or renumbered.
+
+    Points outside the bounds are clamped into the border cells, so a query
+    never misses an item; it may only return extra candidates. """
+
+    def __init__(self, cell_size, bounds):
+        self.cell_size = float(cell_size)
+        self.min_x, self.min_y, max_x, max_y = bounds
+        self.nx = max(1, int(np.ceil((max_x - self.min_x) / self.cell_size)))
+        self.ny = max(1, int(np.ceil((max_y - self.min_y) / self.cell_size)))
+
+        #   Item ids sorted by cell, and where each cell's run starts in it
+        self.order = np.zeros(0, dtype=np.int64)
+        self.cell_start = np.zeros(self.nx * self.ny + 1, dtype=np.int64)
+
+        #   Position of each id within order, for patching
+        self.where = np.zeros(0, dtype=np.int64)
+
+        #   Ids added since the last rebuild; every query returns them
+        self.loose = set()
+
+    def cell_coords(self, xs, ys):
+        cx = np.clip(((xs - self.min_x) // self.cell_size).astype(np.int64), 0, self.nx - 1)
+        cy = np.clip(((ys - self.min_y) // self.cell_size).astype(np.int64), 0, self.ny - 1)
+        return cx, cy
+
+    def rebuild(self, xs, ys):
+        """ Indexes ids 0..len(xs)-1 at the given positions. """
+
+        n = len(xs)
+        cx, cy = self.cell_coords(xs, ys)
+        keys = cy * self.nx + cx
+        self.order = np.argsort(keys, kind="stable")
+        counts = np.bincount(keys, minlength=self.nx * self.ny)
+        self.cell_start = np.zeros(self.nx * self.ny + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.cell_start[1:])
+        self.where = np.zeros(n, dtype=np.int64)
+        self.where[self.order] = np.arange(n)
+        self.loose = set()
+
+    def insert(self, index):
+        self.loose.add(index)
+
+    def remove(self, index):
+        if index in self.loose:
+            self.loose.discard(index)
+        elif index < len(self.where):
+            self.order[self.where[index]] = -1
+
+    def move(self, old, new):
+        """ Renames id old to new, whose previous occupant was removed. """
+
+        if old in self.loose:
+            self.loose.discard(old)
+            self.loose.add(new)
+        elif old < len(self.where) and new < len(self.where):
+            self.order[self.where[old]] = new
+            self.where[new] = self.where[old]
+        else:
+            self.loose.add(new)
+
+    def query(self, x, y, radius):
+        """ Returns an array of candidate ids within radius of (x, y). """
+
+        last_x, last_y = self.nx - 1, self.ny - 1
+        cx0 = min(max(int((x - radius - self.min_x) // self.cell_size), 0), last_x)
+        cx1 = min(max(int((x + radius - self.min_x) // self.cell_size), 0), last_x)
+        cy0 = min(max(int((y - radius - self.min_y) // self.cell_size), 0), last_y)
+        cy1 = min(max(int((y + radius - self.min_y) // self.cell_size), 0), last_y)
+        runs = []
+        for cy in range(cy0, cy1 + 1):
+            row = cy * self.nx
+            start = self.cell_start[row + cx0]
+            end = self.cell_start[row + cx1 + 1]
+            if end > start:
+                runs.append(self.order[start:end])
+        if self.loose:
+            runs.append(np.fromiter(self.loose, dtype=np.int64, count=len(self.loose)))
+        if not runs:
+            return self.order[:0]
+        found = np.concatenate(runs) if len(runs) > 1 else runs[0]
+        return found[found >= 0]
+
+    def query_batch(self, xs, ys, radius):
+        """ query() for many points at once, all with the same radius.
+        Returns arrays (queries, ids) of every candidate id near each point,
+        found cell by cell instead of point by point. """
+
+        cx, cy = self.cell_coords(xs, ys)
+        span = int(np.ceil(radius / self.cell_size))
+        points = np.arange(len(xs))
+        queries, ids = [], []
+        for dy in range(-span, span + 1):
+            for dx in range(-span, span + 1):
+                nx, ny = cx + dx, cy + dy
+                valid = (nx >= 0) & (nx < self.nx) & (ny >= 0) & (ny < self.ny)
+                key = np.where(valid, ny * self.nx + nx, 0)
+                start = self.cell_start[key]
+                counts = np.where(valid, self.cell_start[key + 1] - start, 0)
+                total = counts.sum()
+                if not total:
+                    continue
+                offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                queries.append(np.repeat(points, counts))
+                ids.append(self.order[np.repeat(start, counts) + offsets])
+        if self.loose:
+            loose = np.fromiter(self.loose, dtype=np.int64, count=len(self.loose))
+            queries.append(np.repeat(points, len(loose)))
+            ids.append(np.tile(loose, len(points)))
+        if not queries:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        queries = np.concatenate(queries)
+        ids = np.concatenate(ids)
+        keep = ids >= 0
+        return queries[keep], ids[keep]
+
+    def pairs(self):
+        """ Returns arrays (i, j) of every pair of ids in the same or touching
+        cells, each pair once. Pairs closer than the cell size are never
+        missed. Only ids indexed by the last rebuild are included. """
+
+        n = len(self.where)
+        if n < 2:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        ids = self.order[self.order >= 0]
+        keys = np.searchsorted(self.cell_start, np.flatnonzero(self.order >= 0), side="right") - 1
+        cx = keys % self.nx
+        cy = keys // self.nx
+
+        firsts, seconds = [], []
+        #   Half the neighbourhood, so each pair of cells is visited once
+        for dx, dy in ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)):
+            nx, ny = cx + dx, cy + dy
+            valid = (nx >= 0) & (nx < self.nx) & (ny < self.ny)
+            key = np.where(valid, ny * self.nx + nx, 0)
+            start = self.cell_start[key]
+            counts = np.where(valid, self.cell_start[key + 1] - start, 0)
+            total = counts.sum()
+            if not total:
+                continue
+            first = np.repeat(ids, counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            second = self.order[np.repeat(start, counts) + offsets]
+            keep = second >= 0
+            if dx == 0 and dy == 0:
+                keep &= first < second
+            firsts.append(first[keep])
+            seconds.append(second[keep])
+        if not firsts:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate(firsts), np.concatenate(seconds)
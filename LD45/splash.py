@@ -1,18 +1,27 @@
-from sprite_tools import Sprite, SpriteSheet
-import pygame
+from sprite_tools import Sprite, sheets
+from assets import scales
+from render import SPLASHES
 
 class Splash(object):
 
+    spritesheet_path = "bullet_pop.png"
+    fps = 12
+
     def __init__(self, game, pos):
 
-        spritesheet_path = "bullet_pop.png"
-        splash_sheet = SpriteSheet(spritesheet_path, (8, 1), 8)
-        self.sprite = Sprite(12)
+        splash_sheet = sheets.get(self.spritesheet_path, (8, 1), 8)
+        self.sprite = Sprite(self.fps)
         self.sprite.add_animation({"Pop": splash_sheet})
+        self.reset(game, pos)
+
+    def reset(self, game, pos):
+        """ Restarts a recycled splash at pos. """
+
         self.sprite.start_animation("Pop")
         self.x, self.y = pos
         self.game = game
         self.game.splashes.add(self)
+        self.game.spawned(self)
         self.width = 28
         self.duration = 0.5
         self.age = 0
@@ -34,16 +43,10 @@ class Splash(object):
         width = int(self.width * scale)
         x = int((self.x - camera.x) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_WIDTH//2)
         y = int((self.y - camera.y) * scale * self.game.c.TILE_SIZE - width/2 + self.game.c.WINDOW_HEIGHT//2)
-        scaled = pygame.transform.scale(self.sprite.get_good_frame(), (width, width))
-        self.game.screen.blit(scaled, (x, y))
+        scaled = scales.scale(self.sprite.get_good_frame(), (width, width))
+        self.game.renderer.submit(scaled, (x, y), SPLASHES)
 
 class BulletSpawn(Splash):
 
-    def __init__(self, game, pos):
-        super().__init__(game, pos)
-
-        spritesheet_path = "bullet_spawn.png"
-        splash_sheet = SpriteSheet(spritesheet_path, (8, 1), 8)
-        self.sprite = Sprite(16)
-        self.sprite.add_animation({"Pop": splash_sheet})
-        self.sprite.start_animation("Pop")
\ No newline at end of file
+    spritesheet_path = "bullet_spawn.png"
+    fps = 16
@@ -4,8 +4,12 @@
 import pygame
 
 #   Python libraries
+import copy
 import time
 
+#   Local modules
+from assets import images
+
 class SpriteSheet(object):
     """ Sprite sheet object for pygame. """
 
@@ -37,22 +41,24 @@ class SpriteSheet(object):
         """ Reads the sprite sheet image file and computes dimensions """
 
         #   Load the image from path as a pygame surface
-        self.sheet_img = pygame.image.load(self.img_path)
+        self.sheet_img = images.load(self.img_path)
 
         #   Determine surface width and height
         self.sheet_height = self.sheet_img.get_height()
         self.sheet_width = self.sheet_img.get_width()
 
 
-    def split(self):
-        """ Breaks up the source image into a list of frames """
+    def split(self, mirror_x=False, mirror_y=False):
+        """ Breaks up the source image into a list of frames. mirror_x and
+        mirror_y mean the source image is a mirrored copy of the sheet, so
+        frames are read from the opposite end of each row or column. """
 
         #   Determine frame size, in pixels
         frame_height = int(self.sheet_height / self.y_size)
         frame_width = int(self.sheet_width / self.x_size)
 
         #   Make an empty list to store frames in
-        self.frames = []
+        frames = []
 
         #   Repeat for each frame in animation
         for idx in range(self.frame_num):
@@ -65,10 +71,17 @@ class SpriteSheet(object):
 
             #   Crop the frame number into a pygame surface
             x_origin, y_origin = self.get_frame_position(idx)
+            if mirror_x:
+                x_origin = self.sheet_width - frame_width - x_origin
+            if mirror_y:
+                y_origin = self.sheet_height - frame_height - y_origin
             frame.blit(self.sheet_img, (-x_origin, -y_origin))
 
-            #   Add frame to list
-            self.frames.append(frame)
+            #   Add frame to list, packed into the texture atlas if there is one
+            frames.append(images.pack(frame))
+
+        #   Frames are stored as a tuple so shared sheets can't be altered
+        self.frames = tuple(frames)
 
 
     def reverse(self, xbool, ybool):
@@ -76,8 +89,26 @@ class SpriteSheet(object):
         True. """
 
         #   Flip each frame
-        for idx, frame in enumerate(self.frames):
-            self.frames[idx] = pygame.transform.flip(frame, xbool, ybool)
+        self.frames = tuple(images.pack(pygame.transform.flip(frame, xbool, ybool))
+                            for frame in self.frames)
+
+
+    def mirrored(self, xbool, ybool):
+        """ Returns a new spritesheet with the frames of this one flipped.
+        When the frames tile the image exactly, they are sliced from a shared
+        mirrored copy of it; otherwise each frame is flipped. """
+
+        other = copy.copy(self)
+        tiles = not (self.sheet_width % self.x_size or self.sheet_height % self.y_size)
+        if (xbool or ybool) and tiles and not (self.reverse_x or self.reverse_y):
+            #   The mirrored image may come pre-baked from an asset archive
+            other.sheet_img = images.flipped(self.img_path, xbool, ybool)
+            other.split(xbool, ybool)
+        else:
+            other.reverse(xbool, ybool)
+        other.reverse_x = self.reverse_x != bool(xbool)
+        other.reverse_y = self.reverse_y != bool(ybool)
+        return other
 
 
     def get_frame_position(self, n):
@@ -107,6 +138,39 @@ class SpriteSheet(object):
             return self.frames[min(n, self.frame_num - 1)]
 
 
+class SheetRegistry(object):
+    """ Shared store of sliced spritesheets. Each sheet is sliced once, along
+    with its horizontally mirrored variant, and the same immutable sheet object
+    is handed to every sprite that asks for it. """
+
+    def __init__(self):
+        self.sheets = {}
+
+    def get(self, img_path, sheet_size, frame_num, reverse_x=False, reverse_y=False):
+        """ Returns the shared spritesheet for the given image and layout,
+        flipped according to reverse_x and reverse_y. """
+
+        key = (img_path, tuple(sheet_size), frame_num, bool(reverse_x), bool(reverse_y))
+        sheet = self.sheets.get(key)
+        if sheet is not None:
+            return sheet
+
+        #   Slice the unflipped sheet and precompute its mirror image
+        base_key = key[:3] + (False, False)
+        base = self.sheets.get(base_key)
+        if base is None:
+            base = SpriteSheet(img_path, sheet_size, frame_num)
+            self.sheets[base_key] = base
+            self.sheets[key[:3] + (True, False)] = base.mirrored(1, 0)
+
+        if key not in self.sheets:
+            self.sheets[key] = base.mirrored(reverse_x, reverse_y)
+        return self.sheets[key]
+
+
+sheets = SheetRegistry()
+
+
 class Sprite(object):
     """ Object for rendering a game sprite onto a screen, using pygame. """
 
@@ -0,0 +1,106 @@
+import json
+import time
+import atexit
+import queue
+import threading
+
+
+class TelemetryWriter(object):
+    """ Streams frame timings, entity counts and gameplay events to a file
+    from a background thread, so the loop being measured only pays for a
+    queue put. If the writer falls behind, records are dropped and counted
+    rather than stalling the game.
+
+    A path ending in .json gets the Chrome trace-event format, which loads in
+    Perfetto or chrome://tracing; anything else gets one JSON object per
+    line. The file is finished when close() is called or the program exits. """
+
+    def __init__(self, path, max_queue=4096, chrome=None):
+        self.path = path
+        self.chrome = path.endswith(".json") if chrome is None else chrome
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.written = 0
+        self.closed = False
+        self.origin = time.perf_counter()
+        self.file = open(path, "w")
+        self.thread = threading.Thread(target=self.run, name="telemetry", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def micros(self, seconds):
+        """ Converts a perf_counter reading to microseconds since the start. """
+        return int((seconds - self.origin) * 1000000)
+
+    def put(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def frame(self, start, duration, spans, counts):
+        """ Records one frame. spans is a list of (stage, start, seconds)
+        tuples in perf_counter time. """
+        self.put(("frame", start, duration, spans, counts))
+
+    def event(self, name, args=None):
+        """ Records a gameplay event at the current time. """
+        self.put(("event", time.perf_counter(), name, args or {}))
+
+    def close(self):
+        """ Writes out whatever is queued and closes the file. """
+
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+
+    def run(self):
+        if self.chrome:
+            self.file.write("[\n")
+            self.file.write(json.dumps({"name": "thread_name", "ph": "M", "pid": 0, "tid": 0,
+                                        "args": {"name": "game loop"}}))
+        while True:
+            record = self.queue.get()
+            if record is None:
+                break
+            for line in (self.chrome_events(record) if self.chrome else [self.json_line(record)]):
+                if self.chrome:
+                    self.file.write(",\n")
+                self.file.write(json.dumps(line))
+                if not self.chrome:
+                    self.file.write("\n")
+            self.written += 1
+        if self.chrome:
+            self.file.write("\n]\n")
+        self.file.close()
+
+    def json_line(self, record):
+        if record[0] == "frame":
+            kind, start, duration, spans, counts = record
+            stages = {}
+            for name, _, seconds in spans:
+                stages[name] = stages.get(name, 0) + seconds
+            return {"type": "frame",
+                    "ts": self.micros(start),
+                    "ms": round(duration * 1000, 3),
+                    "stages": {name: round(seconds * 1000, 3) for name, seconds in stages.items()},
+                    "counts": counts}
+        kind, now, name, args = record
+        return {"type": "event", "ts": self.micros(now), "name": name, "args": args}
+
+    def chrome_events(self, record):
+        if record[0] == "frame":
+            kind, start, duration, spans, counts = record
+            events = [{"name": "frame", "ph": "X", "pid": 0, "tid": 0,
+                       "ts": self.micros(start), "dur": int(duration * 1000000)}]
+            for name, span_start, seconds in spans:
+                events.append({"name": name, "ph": "X", "pid": 0, "tid": 0,
+                               "ts": self.micros(span_start), "dur": int(seconds * 1000000)})
+            if counts:
+                events.append({"name": "entities", "ph": "C", "pid": 0, "tid": 0,
+                               "ts": self.micros(start), "args": counts})
+            return events
+        kind, now, name, args = record
+        return [{"name": name, "ph": "i", "s": "g", "pid": 0, "tid": 0, "ts": self.micros(now), "args": args}]
@@ -0,0 +1,41 @@
+class Timeline(object):
+    """ Runs scripted sequences, like the boss's entrance, as generators
+    stepped once per simulation step of the game's own loop, so a cutscene
+    never needs a loop of its own.
+
+    A script yields to give up control. Yielding nothing resumes it on the
+    next step, and yielding a number of seconds resumes it once that much
+    simulated time has passed. Each resume sends in the length of the step
+    it resumed on, so "timer += yield" keeps count of the time passed. """
+
+    def __init__(self):
+        #   [script, seconds left before it resumes] for each running script
+        self.scripts = []
+
+    def play(self, script):
+        """ Starts script, running it up to its first yield straight away. """
+
+        entry = [script, 0]
+        self.scripts.append(entry)
+        self.resume(entry, None)
+        return script
+
+    def resume(self, entry, dt):
+        try:
+            entry[1] = entry[0].send(dt) or 0
+        except StopIteration:
+            self.scripts.remove(entry)
+
+    def update(self, dt):
+        for entry in list(self.scripts):
+            entry[1] -= dt
+            if entry[1] <= 1e-9:
+                self.resume(entry, dt)
+
+    def running(self):
+        return bool(self.scripts)
+
+    def clear(self):
+        for script, wait in self.scripts:
+            script.close()
+        self.scripts = []
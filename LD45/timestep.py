@@ -0,0 +1,31 @@
+class FixedTimestep(object):
+    """ Turns variable frame times into a whole number of fixed simulation
+    steps. Time left over after the last step is carried to the next frame,
+    and alpha says how far the renderer is between the last two states. """
+
+    def __init__(self, rate, max_frame_time=0.1):
+        self.max_frame_time = max_frame_time
+        self.accumulator = 0
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        """ Changes the simulation rate, in steps per second. Can be lowered
+        under load without changing the game's speed. """
+
+        self.rate = rate
+        self.step = 1.0/rate
+        self.accumulator = min(self.accumulator, self.step)
+
+    def advance(self, frame_dt):
+        """ Adds frame_dt seconds of real time and returns how many steps the
+        simulation should run. Frame times above max_frame_time are clamped
+        so that a stall slows the game down instead of piling up steps. """
+
+        self.accumulator += min(frame_dt, self.max_frame_time)
+        steps = int(self.accumulator / self.step)
+        self.accumulator -= steps * self.step
+        return steps
+
+    @property
+    def alpha(self):
+        return min(1.0, self.accumulator / self.step)